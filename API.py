@@ -2,28 +2,90 @@
 # python -m uvicorn API:app --reload
 # Visitar http://127.0.0.1:8000/docs para ver la documentación de la API
 
-from fastapi import FastAPI, HTTPException, Query, Body
-from pymongo import MongoClient, InsertOne
+from fastapi import FastAPI, HTTPException, Query, Body, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from pymongo import AsyncMongoClient, InsertOne, UpdateOne, ASCENDING, DESCENDING
 from bson import ObjectId
-from bson.json_util import dumps
+from bson.json_util import dumps, loads
+from bson.decimal128 import Decimal128
+from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
 import os
 import json
-from pydantic import BaseModel, Field
-from datetime import datetime
+import base64
+import asyncio
+import time
+import logging
+import contextlib
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field, ValidationError
+from datetime import datetime, date, timedelta, timezone
 from typing import List, Optional
-from fastapi.encoders import jsonable_encoder
 from pymongo.collection import ReturnDocument
-import re
 from fastapi.middleware.cors import CORSMiddleware
+from cache import crear_cache
+# Comparación sin distinguir mayúsculas; es la misma colación de los índices de búsqueda
+from indices import COLACION_CI
+import metricas
+import consultas_lentas
+from mantenimiento import ESTADOS_VALIDOS, normalizar_estado, PROMEDIO_CALIFICACION, pipeline_reconciliar_calificaciones
+
+try:
+    import orjson
+except ImportError:  # Sin orjson se usa el módulo json estándar
+    orjson = None
 
 # Cargar variables de entorno
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = "proyecto2-db"
+DB_NAME = os.getenv("DB_NAME", "proyecto2-db")
+PAGINA_DEFAULT = int(os.getenv("PAGINA_DEFAULT", 100))
+PAGINA_MAX = int(os.getenv("PAGINA_MAX", 1000))
+# Estados de una orden que no cuentan como cancelada (/ordenes/mayores)
+ESTADOS_ACTIVOS = [estado for estado in ESTADOS_VALIDOS if estado != "Cancelado"]
+
+INGESTA_LOTE = int(os.getenv("INGESTA_LOTE", 1000))
+INGESTA_MAX_ERRORES = int(os.getenv("INGESTA_MAX_ERRORES", 1000))
+INGESTA_MAX_BYTES_LINEA = int(os.getenv("INGESTA_MAX_BYTES_LINEA", 1024 * 1024))
+STREAM_BATCH_DEFAULT = int(os.getenv("STREAM_BATCH_DEFAULT", 500))
+STREAM_BATCH_MAX = int(os.getenv("STREAM_BATCH_MAX", 10000))
+
+# Frecuencia de refresco de los reportes materializados y margen de la marca de agua
+REPORTES_REFRESCO_SEG = int(os.getenv("REPORTES_REFRESCO_SEG", 60))
+REPORTES_MARGEN_SEG = int(os.getenv("REPORTES_MARGEN_SEG", 5))
+
+# Configuración del pool de conexiones a MongoDB
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0)) or None
+
+# Conexión a MongoDB, creada y cerrada junto con la aplicación
+client = None
+db = None
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    global client, db
+    client = AsyncMongoClient(
+        MONGO_URI,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        event_listeners=[metricas.ComandosMongo(), metricas.PoolMongo(), consultas_lentas.ComandosLentos()],
+    )
+    db = client[DB_NAME]
+    consultas_lentas.registro.explicador = explicar_comando
+    refresco = asyncio.create_task(refrescar_reportes_periodicamente())
+    yield
+    # Se espera a que la tarea termine de cancelarse para no cerrar el cliente a mitad de un $merge
+    refresco.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await refresco
+    await client.close()
 
 # Inicializar FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Permitir CORS
 app.add_middleware(
@@ -34,21 +96,93 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Conexión a MongoDB
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-
-# Conversor de ObjectId a string para la respuesta JSON
-def parse_objectid(obj):
-    if isinstance(obj, dict):
-        return {k: parse_objectid(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [parse_objectid(item) for item in obj]
-    elif isinstance(obj, ObjectId):
-        return str(obj)
-    else:
-        return obj
-    
+# Latencia, tamaño de respuesta y solicitudes en curso por ruta (GET /metrics); va por fuera de CORS
+app.add_middleware(metricas.MiddlewareMetricas, router=app.router)
+# Solicitudes lentas y la ruta que originó cada comando lento (GET /diagnostico/consultas-lentas)
+app.add_middleware(consultas_lentas.MiddlewareConsultasLentas)
+
+# Conversor de los tipos de BSON que JSON no conoce (ObjectId, fechas, decimales)
+def convertir_bson(valor):
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal128):
+        return float(valor.to_decimal())
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+# Serializa documentos de Mongo a JSON en una sola pasada, sin copiar los diccionarios.
+# El conversor solo se llama para los valores que el codificador no reconoce.
+def a_json(obj):
+    if orjson:
+        return orjson.dumps(obj, default=convertir_bson)
+    return json.dumps(obj, default=convertir_bson, ensure_ascii=False, separators=(",", ":")).encode()
+
+# Respuesta JSON que acepta documentos de Mongo tal como los entrega pymongo
+class RespuestaMongo(JSONResponse):
+    def render(self, content):
+        inicio = time.perf_counter()
+        cuerpo = a_json(content)
+        metricas.serializacion.observar(time.perf_counter() - inicio)
+        return cuerpo
+
+def responder(contenido):
+    return RespuestaMongo(contenido)
+
+# Coalescencia de solicitudes (single-flight): las solicitudes idénticas que llegan mientras
+# un cálculo sigue en curso esperan ese mismo cálculo y comparten su resultado
+calculos_en_curso = {}
+
+async def una_sola_vez(clave, calcular):
+    tarea = calculos_en_curso.get(clave)
+    if tarea is None:
+        tarea = asyncio.ensure_future(calcular())
+        calculos_en_curso[clave] = tarea
+
+        def liberar(_):
+            if calculos_en_curso.get(clave) is tarea:
+                del calculos_en_curso[clave]
+        tarea.add_done_callback(liberar)
+    # shield: si un cliente se desconecta no se cancela el cálculo que esperan los demás
+    return await asyncio.shield(tarea)
+
+# Caché de lectura de documentos individuales (ver cache.py)
+cache = crear_cache()
+
+# Claves de caché; los nombres se normalizan igual que la colación sin mayúsculas de las búsquedas
+def clave_restaurante_id(restaurante_id):
+    return f"restaurante:id:{restaurante_id}"
+
+def clave_restaurante_nombre(nombre):
+    return f"restaurante:nombre:{nombre.casefold()}"
+
+async def invalidar_restaurantes(restaurantes):
+    claves = []
+    for restaurante in restaurantes:
+        claves.append(clave_restaurante_id(restaurante["_id"]))
+        if restaurante.get("nombre"):
+            claves.append(clave_restaurante_nombre(restaurante["nombre"]))
+    await cache.invalidar(*claves)
+
+def clave_menu_nombre(nombre):
+    return f"menu:nombre:{nombre.casefold()}"
+
+def clave_orden(orden_id):
+    return f"orden:{orden_id}"
+
+# Lectura a través de la caché: si la clave no está se consulta Mongo y se guarda el JSON serializado.
+# Los "no encontrado" no se guardan, así una inserción nunca queda oculta por la caché.
+async def leer_con_cache(clave, cargar):
+    valor = await cache.obtener(clave)
+    if valor is None:
+        version = await cache.version(clave)
+        doc = await cargar()
+        if doc is None:
+            return None
+        valor = a_json(doc)
+        await cache.guardar(clave, valor, version)
+    return Response(content=valor, media_type="application/json")
+
 # Convierte un diccionario anidado en uno plano con claves jerárquicas
 def flatten_dict(d, parent_key='', sep='.'):
     items = []
@@ -60,6 +194,126 @@ def flatten_dict(d, parent_key='', sep='.'):
             items.append((new_key, v))
     return dict(items)
 
+# Codifica la última llave de una página como un token opaco
+def codificar_cursor(llave):
+    return base64.urlsafe_b64encode(dumps(llave).encode()).decode()
+
+# Recupera la llave guardada en el token de paginación
+def decodificar_cursor(cursor, largo):
+    try:
+        llave = loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(llave, list) or len(llave) != largo:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return llave
+
+# Paginación por llave (keyset): ordena por (campo, _id) y continúa después de la última llave vista,
+# así la página N cuesta lo mismo que la primera y la memoria depende solo del tamaño de página
+async def paginar(coleccion, filtro=None, cursor=None, page_size=None, orden=("_id", ASCENDING), proyeccion=None):
+    campo, direccion = orden
+    tamaño = min(page_size or PAGINA_DEFAULT, PAGINA_MAX)
+    operador = "$gt" if direccion == ASCENDING else "$lt"
+    filtro = dict(filtro or {})
+
+    if cursor:
+        if campo == "_id":
+            (ultimo_id,) = decodificar_cursor(cursor, 1)
+            condicion = {"_id": {operador: ultimo_id}}
+        else:
+            ultimo_valor, ultimo_id = decodificar_cursor(cursor, 2)
+            # El rango inclusivo sobre el campo acota el recorrido del índice; el $or desempata por _id
+            condicion = {campo: {operador + "e": ultimo_valor}, "$or": [
+                {campo: {operador: ultimo_valor}},
+                {campo: ultimo_valor, "_id": {operador: ultimo_id}}
+            ]}
+        filtro = {"$and": [filtro, condicion]} if filtro else condicion
+
+    sort = [("_id", direccion)] if campo == "_id" else [(campo, direccion), ("_id", direccion)]
+    docs = await db[coleccion].find(filtro, proyeccion).sort(sort).limit(tamaño + 1).to_list()
+
+    siguiente = None
+    if len(docs) > tamaño:
+        docs = docs[:tamaño]
+        ultimo = docs[-1]
+        llave = [ultimo["_id"]] if campo == "_id" else [ultimo.get(campo), ultimo["_id"]]
+        siguiente = codificar_cursor(llave)
+
+    return responder({"items": docs, "next": siguiente})
+
+# Búsqueda por relevancia con el índice de texto: ordena por (textScore, _id) y pagina por llave
+async def buscar_texto(coleccion, texto, proyeccion, filtro=None, cursor=None, page_size=None):
+    tamaño = min(page_size or PAGINA_DEFAULT, PAGINA_MAX)
+    pipeline = [
+        {"$match": {"$text": {"$search": texto}, **(filtro or {})}},
+        {"$addFields": {"relevancia": {"$meta": "textScore"}}}
+    ]
+    if cursor:
+        ultima_relevancia, ultimo_id = decodificar_cursor(cursor, 2)
+        pipeline.append({"$match": {"$or": [
+            {"relevancia": {"$lt": ultima_relevancia}},
+            {"relevancia": ultima_relevancia, "_id": {"$gt": ultimo_id}}
+        ]}})
+    pipeline += [
+        {"$sort": {"relevancia": -1, "_id": 1}},
+        {"$limit": tamaño + 1},
+        {"$project": {**{campo: 1 for campo in proyeccion}, "relevancia": 1}}
+    ]
+
+    cursor_mongo = await db[coleccion].aggregate(pipeline)
+    docs = await cursor_mongo.to_list()
+
+    siguiente = None
+    if len(docs) > tamaño:
+        docs = docs[:tamaño]
+        siguiente = codificar_cursor([docs[-1]["relevancia"], docs[-1]["_id"]])
+
+    return responder({"items": docs, "next": siguiente})
+
+# Indica si el request pidió el modo de paginación por cursor
+def modo_cursor(cursor, page_size):
+    return cursor is not None or page_size is not None
+
+# Recorre el cursor de pymongo y escribe cada lote en cuanto llega de Mongo,
+# como NDJSON (un documento por línea) o como un arreglo JSON en partes
+async def generar_stream(cursor, ndjson, batch_size):
+    try:
+        lote = []
+        primero = True
+        if not ndjson:
+            yield b"["
+        async for doc in cursor:
+            lote.append(a_json(doc))
+            if len(lote) >= batch_size:
+                yield unir_lote(lote, ndjson, primero)
+                lote = []
+                primero = False
+        if lote:
+            yield unir_lote(lote, ndjson, primero)
+        if not ndjson:
+            yield b"]"
+    finally:
+        await cursor.close()
+
+def unir_lote(lote, ndjson, primero):
+    if ndjson:
+        return b"\n".join(lote) + b"\n"
+    return (b"" if primero else b",") + b",".join(lote)
+
+# Indica si el request pidió la respuesta en streaming (Accept: application/x-ndjson o ?stream=true)
+def modo_stream(request, stream):
+    return stream or "application/x-ndjson" in request.headers.get("accept", "")
+
+# Respuesta en streaming respaldada directamente por el cursor, sin armar la lista completa en memoria
+def responder_stream(request, coleccion, filtro=None, batch_size=None, sort=None):
+    batch_size = batch_size or STREAM_BATCH_DEFAULT
+    cursor = db[coleccion].find(filtro or {}, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    media_type = "application/x-ndjson" if ndjson else "application/json"
+    return StreamingResponse(generar_stream(cursor, ndjson, batch_size), media_type=media_type)
+
 # Clases de modelos para la validación de datos
 class Ubicacion(BaseModel):
     longitud: float
@@ -125,104 +379,252 @@ class IngredienteChange(BaseModel):
     accion: str  # agregar o quitar
     nombre: str
 
+class ItemOrdenIn(BaseModel):
+    item_id: str
+    cantidad: int = Field(..., gt=0)
+    precio_unitario: float = Field(..., ge=0)
+    descuento: float = Field(0, ge=0, le=1)
+
+class OrdenIn(BaseModel):
+    usuario_id: str
+    restaurante_id: str
+    fecha: datetime
+    estado: str
+    items: List[ItemOrdenIn]
+    total: Optional[float] = None  # Si no viene se calcula con los items
+
+class ResenaIn(BaseModel):
+    reviewed_id: str
+    type: str  # orden o restaurante
+    usuario_id: str
+    comentario: str
+    calificacion: int = Field(..., ge=1, le=5)
+    fecha: datetime
+
+# Convierte un ID recibido como texto, con un error legible si no es válido
+def a_object_id(valor, campo):
+    if not ObjectId.is_valid(valor):
+        raise ValueError(f"{campo} inválido: {valor}")
+    return ObjectId(valor)
+
+# Documentos tal como se guardan en Mongo a partir de los modelos de entrada
+def documento_usuario(usuario: UsuarioIn):
+    return {
+        "nombre": usuario.nombre,
+        "correo": usuario.correo,
+        "telefono": usuario.telefono,
+        "direccion": usuario.direccion.dict(),
+        "fecha_registro": datetime.strptime(usuario.fecha_registro, "%Y-%m-%d")
+    }
+
+# Punto GeoJSON para el índice 2dsphere; GeoJSON usa el orden [longitud, latitud]
+def punto_geojson(latitud, longitud):
+    return {"type": "Point", "coordinates": [float(longitud), float(latitud)]}
+
+def documento_restaurante(restaurante: RestauranteIn):
+    doc = restaurante.dict()
+    ubicacion = restaurante.direccion.ubicacion
+    try:
+        doc["ubicacion_geo"] = punto_geojson(ubicacion["latitud"], ubicacion["longitud"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Ubicación inválida para {restaurante.nombre}: se esperan latitud y longitud numéricas")
+    return doc
+
+# Estado canónico para las rutas; un estado desconocido es un 400
+def estado_canonico(estado):
+    try:
+        return normalizar_estado(estado)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def documento_orden(orden: OrdenIn):
+    estado = normalizar_estado(orden.estado)
+    items = [
+        {
+            "item_id": a_object_id(item.item_id, "item_id"),
+            "cantidad": item.cantidad,
+            "precio_unitario": item.precio_unitario,
+            "descuento": item.descuento
+        }
+        for item in orden.items
+    ]
+    total = orden.total
+    if total is None:
+        total = round(sum(i["cantidad"] * i["precio_unitario"] * (1 - i["descuento"]) for i in items), 2)
+    return {
+        "usuario_id": a_object_id(orden.usuario_id, "usuario_id"),
+        "restaurante_id": a_object_id(orden.restaurante_id, "restaurante_id"),
+        "fecha": orden.fecha,
+        "estado": estado,
+        "items": items,
+        "total": total,
+        "actualizado": datetime.utcnow()
+    }
+
+def documento_resena(resena: ResenaIn):
+    if resena.type not in ("orden", "restaurante"):
+        raise ValueError(f"Tipo de reseña inválido: {resena.type}")
+    return {
+        "reviewed_id": a_object_id(resena.reviewed_id, "reviewed_id"),
+        "type": resena.type,
+        "usuario_id": a_object_id(resena.usuario_id, "usuario_id"),
+        "comentario": resena.comentario,
+        "calificacion": resena.calificacion,
+        "fecha": resena.fecha,
+    }
+
 # Obtener todos los usuarios
 @app.get("/usuarios")
-def obtener_usuarios():
-    usuarios = list(db["usuarios"].find())
-    return [parse_objectid(usuario) for usuario in usuarios]
+async def obtener_usuarios(
+    request: Request,
+    stream: bool = False,
+    batch_size: Optional[int] = Query(None, ge=1, le=STREAM_BATCH_MAX),
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if modo_stream(request, stream):
+        return responder_stream(request, "usuarios", batch_size=batch_size)
+    if modo_cursor(cursor, page_size):
+        return await paginar("usuarios", cursor=cursor, page_size=page_size)
+    usuarios = await db["usuarios"].find().to_list()
+    return responder(usuarios)
 
 # Obtener todos los items del menú
 @app.get("/menu")
-def obtener_menu():
-    menu_items = list(db["menu_items"].find())
-    return [parse_objectid(item) for item in menu_items]
+async def obtener_menu(
+    request: Request,
+    stream: bool = False,
+    batch_size: Optional[int] = Query(None, ge=1, le=STREAM_BATCH_MAX),
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if modo_stream(request, stream):
+        return responder_stream(request, "menu_items", batch_size=batch_size)
+    if modo_cursor(cursor, page_size):
+        return await paginar("menu_items", cursor=cursor, page_size=page_size)
+    menu_items = await db["menu_items"].find().to_list()
+    return responder(menu_items)
 
 # Obtener todas las ordenes
 @app.get("/ordenes")
-def obtener_ordenes():
-    ordenes = list(db["ordenes"].find())
-    return [parse_objectid(orden) for orden in ordenes]
+async def obtener_ordenes(
+    request: Request,
+    stream: bool = False,
+    batch_size: Optional[int] = Query(None, ge=1, le=STREAM_BATCH_MAX),
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if modo_stream(request, stream):
+        return responder_stream(request, "ordenes", batch_size=batch_size)
+    if modo_cursor(cursor, page_size):
+        return await paginar("ordenes", cursor=cursor, page_size=page_size)
+    ordenes = await db["ordenes"].find().to_list()
+    return responder(ordenes)
 
 # Obtener todas las reseñas
 @app.get("/reseñas")
-def obtener_reseñas():
-    reseñas = list(db["resenas"].find())
-    return [parse_objectid(reseña) for reseña in reseñas]
+async def obtener_reseñas(
+    request: Request,
+    stream: bool = False,
+    batch_size: Optional[int] = Query(None, ge=1, le=STREAM_BATCH_MAX),
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if modo_stream(request, stream):
+        return responder_stream(request, "resenas", batch_size=batch_size)
+    if modo_cursor(cursor, page_size):
+        return await paginar("resenas", cursor=cursor, page_size=page_size)
+    reseñas = await db["resenas"].find().to_list()
+    return responder(reseñas)
 
 # Obtener un usuario por correo
 @app.get("/usuario/{correo}")
-def obtener_usuario(correo: str):
-    usuario = db["usuarios"].find_one({"correo": {"$regex": f"^{correo}$", "$options": "i"}})
+async def obtener_usuario(correo: str):
+    usuario = await db["usuarios"].find_one({"correo": correo}, collation=COLACION_CI)
     if usuario:
-        return parse_objectid(usuario)
+        return responder(usuario)
     else:
         return {"mensaje": "Usuario no encontrado"}
     
 # Obtener restaurante por nombre
 @app.get("/restaurante/{nombre}")
-def obtener_restaurante(nombre: str):
-    restaurante = db["restaurantes"].find_one({"nombre": {"$regex": f"^{nombre}$", "$options": "i"}})
+async def obtener_restaurante(nombre: str):
+    restaurante = await leer_con_cache(
+        clave_restaurante_nombre(nombre),
+        lambda: db["restaurantes"].find_one({"nombre": nombre}, collation=COLACION_CI)
+    )
     if restaurante:
-        return parse_objectid(restaurante)
+        return restaurante
     else:
         return {"mensaje": "Restaurante no encontrado"}
     
 # Obtener restaurante por ID
 @app.get("/restaurante/id/{restaurante_id}")
-def obtener_restaurante_id(restaurante_id: str):
-    restaurante = db["restaurantes"].find_one({"_id": ObjectId(restaurante_id)})
+async def obtener_restaurante_id(restaurante_id: str):
+    if not ObjectId.is_valid(restaurante_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+
+    # La clave sale del ObjectId (hex en minúsculas), igual que al invalidar tras una escritura
+    _id = ObjectId(restaurante_id)
+    restaurante = await leer_con_cache(
+        clave_restaurante_id(_id),
+        lambda: db["restaurantes"].find_one({"_id": _id})
+    )
     if restaurante:
-        return parse_objectid(restaurante)
+        return restaurante
     else:
         return {"mensaje": "Restaurante no encontrado"}
 
 # Obtener un item del menú por nombre
 @app.get("/menu/{nombre}")
-def obtener_menu_item(nombre: str):
-    menu_item = db["menu_items"].find_one({"nombre": {"$regex": f"^{nombre}$", "$options": "i"}})
+async def obtener_menu_item(nombre: str):
+    menu_item = await leer_con_cache(
+        clave_menu_nombre(nombre),
+        lambda: db["menu_items"].find_one({"nombre": nombre}, collation=COLACION_CI)
+    )
     if menu_item:
-        return parse_objectid(menu_item)
+        return menu_item
     else:
         return {"mensaje": "Item del menú no encontrado"}
 
 # Obtener una orden por ID
 @app.get("/orden/{orden_id}")
-def obtener_orden(orden_id: str):
-    orden = db["ordenes"].find_one({"_id": ObjectId(orden_id)})
+async def obtener_orden(orden_id: str):
+    if not ObjectId.is_valid(orden_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+
+    _id = ObjectId(orden_id)
+    orden = await leer_con_cache(
+        clave_orden(_id),
+        lambda: db["ordenes"].find_one({"_id": _id})
+    )
     if orden:
-        return parse_objectid(orden)
+        return orden
     else:
         return {"mensaje": "Orden no encontrada"}
     
 # Obtener una reseña por ID
 @app.get("/resena/{resena_id}")
-def obtener_reseña(resena_id: str):
+async def obtener_reseña(resena_id: str):
     if not ObjectId.is_valid(resena_id):
         raise HTTPException(status_code=400, detail="ID inválido")
 
-    resena = db["resenas"].find_one({"_id": ObjectId(resena_id)})
+    resena = await db["resenas"].find_one({"_id": ObjectId(resena_id)})
     if resena:
-        return parse_objectid(resena)
+        return responder(resena)
     else:
         return {"mensaje": "Reseña no encontrada"}
 
 # 1.1 Crear un solo usuario
 @app.post("/nuevoUsuario")
-def crear_usuario(usuario: UsuarioIn):
-    fecha = datetime.strptime(usuario.fecha_registro, "%Y-%m-%d")
-    doc = {
-        "nombre": usuario.nombre,
-        "correo": usuario.correo,
-        "telefono": usuario.telefono,
-        "direccion": usuario.direccion.dict(),
-        "fecha_registro": fecha
-    }
-    resultado = db["usuarios"].insert_one(doc)
+async def crear_usuario(usuario: UsuarioIn):
+    doc = documento_usuario(usuario)
+    resultado = await db["usuarios"].insert_one(doc)
     return {"mensaje": "Usuario creado", "id": str(resultado.inserted_id)}
 
 # 1.2 Crear múltiples restaurantes
 @app.post("/restaurantes/bulk")
-def crear_restaurantes(
+async def crear_restaurantes_bulk(
     restaurantes: List[RestauranteIn] = Body(
         ..., 
         example=[
@@ -253,117 +655,417 @@ def crear_restaurantes(
         ]
     )
 ):
-    docs = [restaurante.dict() for restaurante in restaurantes]
-    resultado = db["restaurantes"].insert_many(docs)
-    return {"mensaje": f"{len(resultado.inserted_ids)} restaurantes creados"}
+    try:
+        operaciones = [InsertOne(documento_restaurante(r)) for r in restaurantes]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    resultado = await db["restaurantes"].bulk_write(operaciones)
+    await cache.invalidar(*[clave_restaurante_nombre(r.nombre) for r in restaurantes])
+    return {"mensaje": f"{resultado.inserted_count} restaurantes creados"}
+
+# 1.3 Ingesta masiva en NDJSON (un documento por línea)
+# El cuerpo se lee conforme llega, cada línea se valida con su modelo y los documentos válidos
+# se insertan en lotes desordenados; la respuesta reporta los errores por número de línea.
+# Solo se busca el salto de línea en el bloque nuevo, y una línea de más de INGESTA_MAX_BYTES_LINEA
+# se descarta hasta su final (se entrega como None) en lugar de acumularla en memoria.
+async def leer_lineas(request):
+    pendiente = bytearray()
+    descartando = False
+    async for bloque in request.stream():
+        inicio = 0
+        while (fin := bloque.find(b"\n", inicio)) != -1:
+            if descartando:
+                descartando = False
+            else:
+                pendiente += bloque[inicio:fin]
+                yield bytes(pendiente) if len(pendiente) <= INGESTA_MAX_BYTES_LINEA else None
+            pendiente.clear()
+            inicio = fin + 1
+        if not descartando:
+            pendiente += bloque[inicio:]
+            if len(pendiente) > INGESTA_MAX_BYTES_LINEA:
+                pendiente.clear()
+                descartando = True
+                yield None
+    if pendiente:
+        yield bytes(pendiente)
+
+# Cuenta cada línea rechazada, pero solo guarda el detalle de las primeras INGESTA_MAX_ERRORES
+def rechazar(rechazos, linea, error):
+    rechazos["total"] += 1
+    if len(rechazos["errores"]) < INGESTA_MAX_ERRORES:
+        rechazos["errores"].append({"linea": linea, "error": error})
+
+# Inserta un lote y devuelve los documentos que sí quedaron guardados
+async def insertar_lote(coleccion, docs, lineas, rechazos):
+    try:
+        await db[coleccion].insert_many(docs, ordered=False)
+        return docs
+    except BulkWriteError as e:
+        fallidos = set()
+        for error in e.details["writeErrors"]:
+            fallidos.add(error["index"])
+            rechazar(rechazos, lineas[error["index"]], error["errmsg"])
+        return [doc for i, doc in enumerate(docs) if i not in fallidos]
+
+# Inserta el lote y avisa al que mantiene datos derivados (contadores, resúmenes) de lo insertado
+async def guardar_lote(coleccion, docs, lineas, rechazos, al_insertar):
+    insertados = await insertar_lote(coleccion, docs, lineas, rechazos)
+    if al_insertar and insertados:
+        await al_insertar(insertados)
+    return len(insertados)
+
+async def ingerir_ndjson(request, coleccion, modelo, a_documento, al_insertar=None):
+    insertados = 0
+    rechazos = {"total": 0, "errores": []}
+    lote, lineas_lote = [], []
+
+    numero = 0
+    async for linea in leer_lineas(request):
+        numero += 1
+        if linea is None:
+            rechazar(rechazos, numero, f"La línea supera {INGESTA_MAX_BYTES_LINEA} bytes")
+            continue
+        if not linea.strip():
+            continue
+        try:
+            doc = a_documento(modelo.model_validate_json(linea))
+        except (ValidationError, ValueError) as e:
+            rechazar(rechazos, numero, str(e))
+            continue
+
+        lote.append(doc)
+        lineas_lote.append(numero)
+        if len(lote) >= INGESTA_LOTE:
+            insertados += await guardar_lote(coleccion, lote, lineas_lote, rechazos, al_insertar)
+            lote, lineas_lote = [], []
+
+    if lote:
+        insertados += await guardar_lote(coleccion, lote, lineas_lote, rechazos, al_insertar)
+
+    return {
+        "mensaje": f"{insertados} documentos insertados en {coleccion}",
+        "insertados": insertados,
+        "rechazados": rechazos["total"],
+        "errores": rechazos["errores"]
+    }
+
+@app.post("/usuarios/ingesta")
+async def ingerir_usuarios(request: Request):
+    return await ingerir_ndjson(request, "usuarios", UsuarioIn, documento_usuario)
+
+@app.post("/ordenes/ingesta")
+async def ingerir_ordenes(request: Request):
+    return await ingerir_ndjson(request, "ordenes", OrdenIn, documento_orden, sumar_ordenes_insertadas)
+
+@app.post("/resenas/ingesta")
+async def ingerir_resenas(request: Request):
+    return await ingerir_ndjson(request, "resenas", ResenaIn, documento_resena, contar_resenas_insertadas)
 
 # 2.1 Filtrar restaurantes por ciudad y/o categoría
 @app.get("/restaurantes/filtro")
-def filtrar_restaurantes(ciudad: str = Query(None), categoria: str = Query(None)):
+async def filtrar_restaurantes(ciudad: str = Query(None), categoria: str = Query(None)):
     filtro = {}
 
     if ciudad:
-        filtro["ciudad"] = {"$regex": f"^{ciudad}$", "$options": "i"}
+        filtro["ciudad"] = ciudad
     if categoria:
-        filtro["categoria"] = {"$regex": f"^{categoria}$", "$options": "i"}
+        filtro["categoria"] = categoria
 
-    restaurantes = list(db["restaurantes"].find(filtro))
+    restaurantes = await db["restaurantes"].find(filtro, collation=COLACION_CI).to_list()
     if not restaurantes:
         raise HTTPException(status_code=404, detail="No se encontraron restaurantes con esos criterios")
     
-    return [parse_objectid(restaurante) for restaurante in restaurantes]
+    return responder(restaurantes)
 
 # 2.2 Proyección de usuarios y sus correos
 @app.get("/usuarios/proyeccion")
-def proyectar_usuarios():
-    usuarios = list(db["usuarios"].find({}, {"_id": 0, "nombre": 1, "correo": 1}))
+async def proyectar_usuarios():
+    usuarios = await db["usuarios"].find({}, {"_id": 0, "nombre": 1, "correo": 1}).to_list()
     return usuarios
 
 # 2.3 Reseñas ordenadas por calificación (de mayor a menor)
 @app.get("/reseñas/ordenadas")
-def obtener_reseñas_ordenadas():
-    reseñas = list(db["resenas"].find().sort("calificacion", -1))
-    return [parse_objectid(r) for r in reseñas]
+async def obtener_reseñas_ordenadas(
+    request: Request,
+    stream: bool = False,
+    batch_size: Optional[int] = Query(None, ge=1, le=STREAM_BATCH_MAX),
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if modo_stream(request, stream):
+        return responder_stream(request, "resenas", batch_size=batch_size, sort=[("calificacion", DESCENDING), ("_id", DESCENDING)])
+    if modo_cursor(cursor, page_size):
+        return await paginar("resenas", cursor=cursor, page_size=page_size, orden=("calificacion", DESCENDING))
+    reseñas = await db["resenas"].find().sort("calificacion", -1).to_list()
+    return responder(reseñas)
 
 # 2.4 Obtener a los restaurantes según un límite y un desplazamiento
+# Con cursor se usa paginación por llave en lugar de skip, que se vuelve lento en páginas profundas
 @app.get("/restaurantes/")
-def obtener_restaurantes(skip: int = 0, limit: int = 10):
-    restaurantes = db["restaurantes"].find().skip(skip).limit(limit)
-    return [parse_objectid(r) for r in restaurantes]
+async def obtener_restaurantes(
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if modo_cursor(cursor, page_size):
+        return await paginar("restaurantes", cursor=cursor, page_size=page_size or limit)
+    restaurantes = await db["restaurantes"].find().skip(skip).limit(limit).to_list()
+    return responder(restaurantes)
 
 # 2.5 ordenes con un total mayor a cierta cantidad
+# Igualdad sobre los estados ($in) y rango sobre total: lo atiende idx_estado_total sin leer órdenes
+# que no cumplan. Por defecto se excluyen las canceladas; "limit" devuelve solo las N de mayor
+# (o menor) total y cursor/page_size pagina por llave (total, _id).
 @app.get("/ordenes/mayores")
-def obtener_ordenes_mayores(goal: float = 100.00):
-    ordenes = list(db["ordenes"].find({
-        "total": {"$gt": goal},
-        "estado": {"$not": {"$regex": "^cancelado$", "$options": "i"}}
-    }))
-    return [parse_objectid(o) for o in ordenes]
+async def obtener_ordenes_mayores(
+    goal: float = 100.00,
+    estado: Optional[List[str]] = Query(None),
+    orden: str = "desc",
+    limit: Optional[int] = Query(None, ge=1, le=PAGINA_MAX),
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if orden not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="'orden' debe ser 'asc' o 'desc'")
+    direccion = ASCENDING if orden == "asc" else DESCENDING
+    estados = sorted({estado_canonico(e) for e in estado}) if estado else ESTADOS_ACTIVOS
+    filtro = {"estado": {"$in": estados}, "total": {"$gt": goal}}
+
+    if modo_cursor(cursor, page_size):
+        return await paginar("ordenes", filtro, cursor, page_size or limit, orden=("total", direccion))
+
+    consulta = db["ordenes"].find(filtro).sort([("total", direccion), ("_id", direccion)])
+    if limit:
+        consulta = consulta.limit(limit)
+    ordenes = await consulta.to_list()
+    return responder(ordenes)
+
+# 2.6 Búsqueda de texto en restaurantes (nombre y ciudad), ordenada por relevancia
+@app.get("/buscar/restaurantes")
+async def buscar_restaurantes(
+    q: str = Query(..., min_length=1),
+    categoria: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    filtro = {"categoria": categoria} if categoria else None
+    proyeccion = ["nombre", "ciudad", "categoria", "calificacion_promedio"]
+    return await buscar_texto("restaurantes", q, proyeccion, filtro, cursor, page_size)
+
+# 2.6.1 Búsqueda de texto en el menú (nombre y descripción), ordenada por relevancia
+@app.get("/buscar/menu")
+async def buscar_menu(
+    q: str = Query(..., min_length=1),
+    restaurante_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if restaurante_id and not ObjectId.is_valid(restaurante_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+    filtro = {"restaurante_id": ObjectId(restaurante_id)} if restaurante_id else None
+    proyeccion = ["nombre", "descripcion", "precio", "categoria", "restaurante_id"]
+    return await buscar_texto("menu_items", q, proyeccion, filtro, cursor, page_size)
+
+# 2.7 Restaurantes más cercanos a un punto, opcionalmente de una categoría
+# $geoNear usa el índice 2dsphere sobre ubicacion_geo y devuelve la distancia en metros
+@app.get("/restaurantes/cercanos")
+async def restaurantes_cercanos(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    n: int = Query(10, ge=1, le=100),
+    categoria: Optional[str] = None
+):
+    pipeline = [
+        {
+            "$geoNear": {
+                "near": punto_geojson(lat, lng),
+                "distanceField": "distancia_m",
+                "spherical": True,
+                "query": {"categoria": categoria} if categoria else {}
+            }
+        },
+        {"$limit": n}
+    ]
+    # La categoría se compara sin mayúsculas, igual que en /restaurantes/filtro
+    cursor = await db["restaurantes"].aggregate(pipeline, collation=COLACION_CI)
+    restaurantes = await cursor.to_list()
+    return responder(restaurantes)
+
+# 2.8 Restaurantes dentro de un radio (en metros), del más cercano al más lejano
+@app.get("/restaurantes/radio")
+async def restaurantes_en_radio(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    metros: float = Query(..., gt=0),
+    categoria: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=PAGINA_MAX)
+):
+    pipeline = [
+        {
+            "$geoNear": {
+                "near": punto_geojson(lat, lng),
+                "distanceField": "distancia_m",
+                "maxDistance": metros,
+                "spherical": True,
+                "query": {"categoria": categoria} if categoria else {}
+            }
+        },
+        {"$limit": limit}
+    ]
+    # La categoría se compara sin mayúsculas, igual que en /restaurantes/filtro
+    cursor = await db["restaurantes"].aggregate(pipeline, collation=COLACION_CI)
+    restaurantes = await cursor.to_list()
+    return responder(restaurantes)
+
+# 2.9 Historial de órdenes de un usuario, de la más reciente a la más antigua, paginado por llave (fecha, _id)
+# Recorre un solo rango de idx_usuario_fecha. Con resumen=true solo pide campos que están en el índice
+# (_id, fecha, estado y total), así que la consulta queda cubierta y no lee ningún documento.
+PROYECCION_RESUMEN_ORDEN = {"_id": 1, "fecha": 1, "estado": 1, "total": 1}
+
+@app.get("/usuarios/{usuario_id}/ordenes")
+async def historial_ordenes_usuario(
+    usuario_id: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    resumen: bool = False,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=PAGINA_MAX)
+):
+    if not ObjectId.is_valid(usuario_id):
+        raise HTTPException(status_code=400, detail="ID de usuario inválido")
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' no puede ser posterior a 'hasta'")
+
+    filtro = {"usuario_id": ObjectId(usuario_id)}
+    if desde or hasta:
+        filtro["fecha"] = {}
+        if desde:
+            filtro["fecha"]["$gte"] = desde
+        if hasta:
+            filtro["fecha"]["$lte"] = hasta
+
+    proyeccion = PROYECCION_RESUMEN_ORDEN if resumen else None
+    return await paginar("ordenes", filtro, cursor, page_size, orden=("fecha", DESCENDING), proyeccion=proyeccion)
 
 # 3.1 actualizar los datos de un usuario
 @app.put("/actualizarUsuario/{correo}")
-def actualizar_usuario(correo: str, datos: UsuarioUpdate):
-    filtro = {"correo": {"$regex": f"^{correo}$", "$options": "i"}}
-    usuario_existente = db["usuarios"].find_one(filtro)
+async def actualizar_usuario(correo: str, datos: UsuarioUpdate):
+    filtro = {"correo": correo}
+    usuario_existente = await db["usuarios"].find_one(filtro, collation=COLACION_CI)
 
     if not usuario_existente:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     update_fields = datos.dict(exclude_unset=True)
 
-    flat_update = flatten_dict(jsonable_encoder(update_fields))
+    flat_update = flatten_dict(update_fields)
 
-    usuario_actualizado = db["usuarios"].find_one_and_update(
+    usuario_actualizado = await db["usuarios"].find_one_and_update(
         filtro,
         {"$set": flat_update},
+        collation=COLACION_CI,
         return_document=ReturnDocument.AFTER
     )
 
-    return {"mensaje": "Usuario actualizado", "usuario": parse_objectid(usuario_actualizado)}
+    return responder({"mensaje": "Usuario actualizado", "usuario": usuario_actualizado})
 
 # 3.2 Actualizar los estados de una orden
 @app.put("/actualizarEstadosOrdenes")
-def actualizar_estados_ordenes(
+async def actualizar_estados_ordenes(
     ordenes: List[OrdenEstadoItem] = Body(..., example=[
         {"id": "60c72b2f9b1e8a0f0c5d0808", "estado": "Entregado"},
         {"id": "60c72b2f9b1e8a0f0c5d0809", "estado": "Cancelado"}
     ])
 ):
-    estados_validos = ["Cancelado", "Entregado", "Pendiente", "Preparando"]
-
+    # Validamos todo el lote antes de escribir para no dejar actualizaciones a medias;
+    # el estado se guarda siempre en su forma canónica ("entregado" → "Entregado")
     for orden in ordenes:
-        if orden.estado not in estados_validos:
-            raise HTTPException(status_code=400, detail=f"Estado inválido: {orden.estado}")
-
-        filtro = {"_id": ObjectId(orden.id)}
-        result = db["ordenes"].find_one_and_update(
-            filtro,
-            {"$set": {"estado": orden.estado}},
-            return_document=ReturnDocument.AFTER
-        )
+        estado_canonico(orden.estado)
+        if not ObjectId.is_valid(orden.id):
+            raise HTTPException(status_code=400, detail=f"ID inválido: {orden.id}")
+
+    # Si un ID viene repetido se aplica el último estado enviado
+    cambios = {ObjectId(orden.id): normalizar_estado(orden.estado) for orden in ordenes}
+
+    # Un solo viaje para saber qué órdenes existen y cuáles cambian de estado;
+    # los items, la fecha y el restaurante sirven para mover los acumulados de ventas
+    existentes = await db["ordenes"].find(
+        {"_id": {"$in": list(cambios)}},
+        {"estado": 1, "fecha": 1, "restaurante_id": 1, "items": 1}
+    ).to_list()
+    estados_actuales = {orden["_id"]: orden.get("estado") for orden in existentes}
+
+    modificadas = [
+        orden_id for orden_id, estado in cambios.items()
+        if orden_id in estados_actuales and estados_actuales[orden_id] != estado
+    ]
 
-        if not result:
-            raise HTTPException(status_code=404, detail=f"Orden con ID {orden.id} no encontrada")
+    # Cada actualización exige el estado leído, así los acumulados solo se mueven si el cambio se aplicó
+    ahora = datetime.utcnow()
+    operaciones = [
+        UpdateOne(
+            {"_id": orden_id, "estado": estados_actuales[orden_id]},
+            {"$set": {"estado": cambios[orden_id], "actualizado": ahora}}
+        )
+        for orden_id in modificadas
+    ]
+    aplicadas = set()
+    if operaciones:
+        resultado = await db["ordenes"].bulk_write(operaciones, ordered=False)
+        await cache.invalidar(*[clave_orden(orden_id) for orden_id in modificadas])
+
+        aplicadas = set(modificadas)
+        if resultado.matched_count < len(operaciones):
+            # Otra escritura cambió alguna orden entre la lectura y la actualización
+            actuales = await db["ordenes"].find({"_id": {"$in": modificadas}}, {"estado": 1}).to_list()
+            aplicadas = {orden["_id"] for orden in actuales if orden.get("estado") == cambios[orden["_id"]]}
+
+        deltas = {}
+        for orden in existentes:
+            if orden["_id"] in aplicadas:
+                deltas_ventas(deltas, orden, estados_actuales[orden["_id"]], -1)
+                deltas_ventas(deltas, orden, cambios[orden["_id"]], 1)
+        await acumular_ventas(deltas)
+
+    resultados = [
+        {
+            "id": str(orden_id),
+            "encontrada": orden_id in estados_actuales,
+            "modificada": orden_id in aplicadas
+        }
+        for orden_id in cambios
+    ]
 
-    return {"mensaje": "Estados de las órdenes actualizados correctamente"}
+    return {
+        "mensaje": "Estados de las órdenes actualizados correctamente",
+        "encontradas": sum(r["encontrada"] for r in resultados),
+        "modificadas": sum(r["modificada"] for r in resultados),
+        "faltantes": sum(not r["encontrada"] for r in resultados),
+        "resultados": resultados
+    }
 
 # 4.1 Eliminar una reseña
 @app.delete("/resenas/{resena_id}")
-def eliminar_resena(resena_id: str):
+async def eliminar_resena(resena_id: str):
     if not ObjectId.is_valid(resena_id):
         raise HTTPException(status_code=400, detail="ID de reseña inválido")
 
-    resultado = db["resenas"].delete_one({"_id": ObjectId(resena_id)})
+    resena = await db["resenas"].find_one_and_delete({"_id": ObjectId(resena_id)})
 
-    if resultado.deleted_count == 0:
+    if not resena:
         raise HTTPException(status_code=404, detail="Reseña no encontrada")
 
+    if resena.get("type") == "restaurante":
+        await ajustar_calificaciones({resena["reviewed_id"]: (-resena["calificacion"], -1)})
+
     return {"mensaje": "Reseña eliminada correctamente"}
 
 # 4.2 Eliminar a todos los usuarios de un municipio específico
 @app.delete("/usuarios/municipio/{municipio}")
-def eliminar_usuarios_por_municipio(municipio: str):
-    resultado = db["usuarios"].delete_many({"direccion.municipio": municipio})
+async def eliminar_usuarios_por_municipio(municipio: str):
+    resultado = await db["usuarios"].delete_many({"direccion.municipio": municipio})
 
     if resultado.deleted_count == 0:
         return {"mensaje": f"No se encontraron usuarios en el municipio '{municipio}'"}
@@ -372,7 +1074,7 @@ def eliminar_usuarios_por_municipio(municipio: str):
 
 # 5.1 Restaurantes por ciudad
 @app.get("/restaurantes/por-ciudad")
-def obtener_restaurantes_por_ciudad():
+async def obtener_restaurantes_por_ciudad():
     pipeline = [
         {
             "$group": {
@@ -385,13 +1087,17 @@ def obtener_restaurantes_por_ciudad():
         }
     ]
     
-    resultado = list(db["restaurantes"].aggregate(pipeline))
+    async def calcular():
+        cursor = await db["restaurantes"].aggregate(pipeline)
+        return await cursor.to_list()
+
+    resultado = await una_sola_vez("restaurantes_por_ciudad", calcular)
     
     return {"restaurantes_por_ciudad": resultado}
 
 # 5.1.2 Usuarios por municipio
 @app.get("/reportes/usuarios_por_municipio")
-def usuarios_por_municipio():
+async def usuarios_por_municipio():
     try:
         pipeline = [
             # Filtramos por el campo "municipio" dentro de la dirección
@@ -407,193 +1113,516 @@ def usuarios_por_municipio():
             }
         ]
 
-        resultados = list(db["usuarios"].aggregate(pipeline))
+        async def calcular():
+            cursor = await db["usuarios"].aggregate(pipeline)
+            return await cursor.to_list()
 
-        # Convertimos ObjectId a string en caso de que sea necesario (en este caso no lo es, ya que solo estamos usando strings)
-        resultados = parse_objectid(resultados)
+        resultados = await una_sola_vez("usuarios_por_municipio", calcular)
 
         return {"usuarios_por_municipio": resultados}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-#5.2 Items del menú más vendidos por restaurante
-@app.get("/reportes/platos_mas_vendidos")
-def platos_mas_vendidos_por_restaurante():
-    try:
-        pipeline = [
-            # Filtramos las ordenes que están en estado "Entregado"
-            {"$match": {"estado": "Entregado"}},
-
-            # Desempaquetamos los items de cada orden
-            {"$unwind": "$items"},
-
-            # Agrupamos por restaurante y item_id, sumando la cantidad vendida
+# Contadores de calificación por restaurante (resenas_suma, resenas_total y calificacion_promedio).
+# Cada ajuste es una actualización atómica con pipeline: suma los deltas y recalcula el promedio.
+async def ajustar_calificaciones(cambios):
+    operaciones = [
+        UpdateOne({"_id": restaurante_id}, [
             {
-                "$group": {
-                    "_id": {
-                        "restaurante_id": "$restaurante_id",
-                        "item_id": "$items.item_id"
-                    },
-                    "total_vendido": {"$sum": "$items.cantidad"}
+                "$set": {
+                    "resenas_suma": {"$add": [{"$ifNull": ["$resenas_suma", 0]}, suma]},
+                    "resenas_total": {"$add": [{"$ifNull": ["$resenas_total", 0]}, total]}
                 }
             },
+            {"$set": {"calificacion_promedio": PROMEDIO_CALIFICACION}}
+        ])
+        for restaurante_id, (suma, total) in cambios.items()
+    ]
+    if operaciones:
+        await db["restaurantes"].bulk_write(operaciones, ordered=False)
+        restaurantes = await db["restaurantes"].find({"_id": {"$in": list(cambios)}}, {"nombre": 1}).to_list()
+        await invalidar_restaurantes(restaurantes)
+
+# Acumula los deltas de las reseñas de restaurante recién insertadas
+async def contar_resenas_insertadas(resenas):
+    cambios = {}
+    for resena in resenas:
+        if resena["type"] == "restaurante":
+            suma, total = cambios.get(resena["reviewed_id"], (0, 0))
+            cambios[resena["reviewed_id"]] = (suma + resena["calificacion"], total + 1)
+    await ajustar_calificaciones(cambios)
+
+# Acumulados diarios de ventas (ventas_diarias): un documento por restaurante, item del menú, día y estado
+# con la cantidad, el bruto, el descuento y las órdenes. Las órdenes nuevas suman a su acumulado y un cambio
+# de estado mueve los montos del acumulado del estado anterior al del nuevo.
+# `python mantenimiento.py ventas` los reconstruye desde las órdenes.
+def dia_utc(fecha):
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return datetime(fecha.year, fecha.month, fecha.day)
+
+# Suma (signo 1) o resta (signo -1) los montos de la orden en `deltas`, agrupados por acumulado
+def deltas_ventas(deltas, orden, estado, signo):
+    por_item = {}
+    for item in orden.get("items", []):
+        bruto = item["cantidad"] * item["precio_unitario"]
+        cantidad, suma_bruto, descuento = por_item.get(item["item_id"], (0, 0, 0))
+        por_item[item["item_id"]] = (cantidad + item["cantidad"], suma_bruto + bruto, descuento + bruto * item["descuento"])
+
+    dia = dia_utc(orden["fecha"])
+    for item_id, (cantidad, bruto, descuento) in por_item.items():
+        acumulado = deltas.setdefault(
+            (orden["restaurante_id"], estado, dia, item_id),
+            {"cantidad": 0, "bruto": 0, "descuento": 0, "ordenes": 0}
+        )
+        acumulado["cantidad"] += signo * cantidad
+        acumulado["bruto"] += signo * bruto
+        acumulado["descuento"] += signo * descuento
+        acumulado["ordenes"] += signo
+
+async def acumular_ventas(deltas):
+    operaciones = [
+        UpdateOne(
+            {"restaurante_id": restaurante_id, "estado": estado, "dia": dia, "item_id": item_id},
+            {"$inc": valores},
+            upsert=True
+        )
+        for (restaurante_id, estado, dia, item_id), valores in deltas.items()
+    ]
+    if not operaciones:
+        return
+    await db["ventas_diarias"].bulk_write(operaciones, ordered=False)
+
+    # Los acumulados que se quedaron sin órdenes se eliminan
+    vaciados = [
+        {"restaurante_id": restaurante_id, "estado": estado, "dia": dia, "item_id": item_id}
+        for (restaurante_id, estado, dia, item_id), valores in deltas.items()
+        if valores["ordenes"] < 0
+    ]
+    if vaciados:
+        await db["ventas_diarias"].delete_many({"$or": vaciados, "ordenes": {"$lte": 0}})
 
-            # Buscamos la información del plato (nombre, precio, etc.)
-            {
-                "$lookup": {
-                    "from": "menu_items",
-                    "localField": "_id.item_id",
-                    "foreignField": "_id",
-                    "as": "plato_info"
-                }
-            },
+async def sumar_ordenes_insertadas(ordenes):
+    deltas = {}
+    for orden in ordenes:
+        deltas_ventas(deltas, orden, orden["estado"], 1)
+    await acumular_ventas(deltas)
+
+#5.2 Reportes materializados
+# Los reportes pesados se precalculan con $merge en colecciones propias y se refrescan de forma incremental:
+# solo se recalculan los restaurantes con órdenes modificadas desde la última marca de agua ("cambios"),
+# y se calculan desde los acumulados de ventas_diarias ("origen"), no desde todas las órdenes.
+REPORTES = {
+    "platos_mas_vendidos": {
+        "cambios": "ordenes",
+        "origen": "ventas_diarias",
+        "destino": "reporte_platos_mas_vendidos",
+        "campo_restaurante": "restaurante_id",
+        "filtro": {},
+    },
+}
+
+# Items del menú más vendidos por restaurante
+def pipeline_platos_mas_vendidos(restaurantes=None):
+    # Acumulados de órdenes en estado "Entregado"; con restaurantes usa el prefijo de idx_ventas_clave
+    match = {"estado": "Entregado"}
+    if restaurantes is not None:
+        match["restaurante_id"] = {"$in": restaurantes}
+
+    return [
+        {"$match": match},
+
+        # Sumamos los días de cada restaurante e item_id
+        {
+            "$group": {
+                "_id": {
+                    "restaurante_id": "$restaurante_id",
+                    "item_id": "$item_id"
+                },
+                "total_vendido": {"$sum": "$cantidad"}
+            }
+        },
 
-            # Desempaquetamos la información del plato
-            {"$unwind": "$plato_info"},
+        # Buscamos la información del plato (nombre, precio, etc.)
+        {
+            "$lookup": {
+                "from": "menu_items",
+                "localField": "_id.item_id",
+                "foreignField": "_id",
+                "as": "plato_info"
+            }
+        },
 
-            # Agrupamos por restaurante y creamos una lista de platos vendidos
-            {
-                "$group": {
-                    "_id": "$_id.restaurante_id",
-                    "platos_vendidos": {
-                        "$push": {
-                            "plato": "$plato_info.nombre",
-                            "cantidad": "$total_vendido",
-                            "precio": "$plato_info.precio"
-                        }
+        # Desempaquetamos la información del plato
+        {"$unwind": "$plato_info"},
+
+        # Agrupamos por restaurante y creamos una lista de platos vendidos
+        {
+            "$group": {
+                "_id": "$_id.restaurante_id",
+                "platos_vendidos": {
+                    "$push": {
+                        "plato": "$plato_info.nombre",
+                        "cantidad": "$total_vendido",
+                        "precio": "$plato_info.precio"
                     }
                 }
-            },
+            }
+        },
 
-            # Buscamos la información del restaurante (nombre, etc.)
-            {
-                "$lookup": {
-                    "from": "restaurantes",
-                    "localField": "_id",
-                    "foreignField": "_id",
-                    "as": "restaurante_info"
-                }
-            },
+        # Buscamos la información del restaurante (nombre, etc.)
+        {
+            "$lookup": {
+                "from": "restaurantes",
+                "localField": "_id",
+                "foreignField": "_id",
+                "as": "restaurante_info"
+            }
+        },
 
-            # Desempaquetamos la información del restaurante
-            {"$unwind": "$restaurante_info"},
+        # Desempaquetamos la información del restaurante
+        {"$unwind": "$restaurante_info"},
 
-            # Proyectamos el resultado final con el nombre del restaurante y la lista de platos vendidos
-            {
-                "$project": {
-                    "restaurante_nombre": "$restaurante_info.nombre",
-                    "platos_vendidos": 1
+        # Proyectamos el nombre del restaurante y los platos ordenados del más al menos vendido
+        {
+            "$project": {
+                "restaurante_nombre": "$restaurante_info.nombre",
+                "platos_vendidos": {
+                    "$sortArray": {"input": "$platos_vendidos", "sortBy": {"cantidad": -1}}
                 }
             }
+        }
+    ]
+
+PIPELINES_REPORTES = {
+    "platos_mas_vendidos": pipeline_platos_mas_vendidos,
+}
+
+# Recalcula un reporte: completo la primera vez, y luego solo para los restaurantes afectados.
+# Los refrescos simultáneos del mismo reporte se unen en uno solo.
+async def refrescar_reporte(nombre, completo=False):
+    return await una_sola_vez(f"refrescar:{nombre}:{completo}", lambda: calcular_refresco(nombre, completo))
+
+async def calcular_refresco(nombre, completo):
+    config = REPORTES[nombre]
+    marca = datetime.utcnow()
+    estado = await db["reportes_estado"].find_one({"_id": nombre})
+
+    afectados = None
+    if estado and not completo:
+        desde = estado["marca"] - timedelta(seconds=REPORTES_MARGEN_SEG)
+        afectados = await db[config["cambios"]].distinct(
+            config["campo_restaurante"],
+            {**config["filtro"], "actualizado": {"$gt": desde}}
+        )
+
+    if afectados != []:
+        pipeline = PIPELINES_REPORTES[nombre](afectados) + [
+            {"$addFields": {"refrescado": marca}},
+            {"$merge": {"into": config["destino"], "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
         ]
+        cursor = await db[config["origen"]].aggregate(pipeline)
+        await cursor.to_list()
+
+        # Los restaurantes que ya no aparecen en el resultado se quitan del reporte
+        obsoletos = {"refrescado": {"$ne": marca}}
+        if afectados is not None:
+            obsoletos["_id"] = {"$in": afectados}
+        await db[config["destino"]].delete_many(obsoletos)
+
+    await db["reportes_estado"].update_one({"_id": nombre}, {"$set": {"marca": marca}}, upsert=True)
+
+    return {"reporte": nombre, "completo": afectados is None, "restaurantes_refrescados": None if afectados is None else len(afectados)}
+
+# Construye el reporte la primera vez que se consulta si todavía no existe
+async def asegurar_reporte(nombre):
+    if not await db["reportes_estado"].find_one({"_id": nombre}):
+        await refrescar_reporte(nombre, completo=True)
+
+# Refresca los reportes periódicamente mientras la aplicación está activa
+async def refrescar_reportes_periodicamente():
+    while True:
+        await asyncio.sleep(REPORTES_REFRESCO_SEG)
+        for nombre in REPORTES:
+            try:
+                await refrescar_reporte(nombre)
+            except Exception:
+                logger.exception("Error al refrescar el reporte %s", nombre)
+
+# Métricas de la API, de Mongo y del pool de conexiones en formato de Prometheus
+@app.get("/metrics")
+async def exponer_metricas():
+    return Response(metricas.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Explain de un comando lento. Con $out o $merge, executionStats escribiría el resultado,
+# así que esos pipelines solo se explican con el plan elegido (queryPlanner)
+async def explicar_comando(base, comando):
+    etapas = [etapa for etapa in comando.get("pipeline", []) if isinstance(etapa, dict)]
+    escribe = any("$out" in etapa or "$merge" in etapa for etapa in etapas)
+    verbosidad = "queryPlanner" if escribe else "executionStats"
+    return await client[base].command({"explain": comando, "verbosity": verbosidad})
+
+# Operaciones lentas recientes (la más nueva primero); con completo=true incluye el explain entero
+@app.get("/diagnostico/consultas-lentas")
+async def listar_consultas_lentas(
+    tipo: Optional[str] = None,
+    ruta: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=consultas_lentas.MAX_ENTRADAS),
+    completo: bool = False
+):
+    if tipo not in (None, "comando", "solicitud"):
+        raise HTTPException(status_code=400, detail="'tipo' debe ser 'comando' o 'solicitud'")
+    entradas = consultas_lentas.registro.listar(tipo, ruta, limit)
+    if not completo:
+        entradas = [{k: v for k, v in entrada.items() if k != "explain"} for entrada in entradas]
+    return responder({
+        "umbral_ms": consultas_lentas.UMBRAL_MS,
+        "umbral_http_ms": consultas_lentas.UMBRAL_HTTP_MS,
+        "entradas": entradas
+    })
+
+@app.delete("/diagnostico/consultas-lentas")
+async def vaciar_consultas_lentas():
+    consultas_lentas.registro.vaciar()
+    return {"mensaje": "Registro de consultas lentas vaciado"}
+
+# Aciertos, fallos y tamaño de la caché de lectura
+@app.get("/cache/estadisticas")
+async def estadisticas_cache():
+    return await cache.estadisticas()
+
+# Fuerza el refresco de los reportes materializados
+@app.post("/reportes/refrescar")
+async def refrescar_reportes(completo: bool = False):
+    try:
+        resultados = [await refrescar_reporte(nombre, completo) for nombre in REPORTES]
+        return {"reportes": resultados}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        resultados = list(db["ordenes"].aggregate(pipeline))
+#5.2.1 Items del menú más vendidos por restaurante
+@app.get("/reportes/platos_mas_vendidos")
+async def platos_mas_vendidos_por_restaurante(restaurante_id: Optional[str] = None):
+    if restaurante_id and not ObjectId.is_valid(restaurante_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
 
-        for r in resultados:
-            r["platos_vendidos"] = sorted(r["platos_vendidos"], key=lambda x: x["cantidad"], reverse=True)
+    try:
+        await asegurar_reporte("platos_mas_vendidos")
 
-        resultados = parse_objectid(resultados)
+        filtro = {"_id": ObjectId(restaurante_id)} if restaurante_id else {}
+        resultados = await una_sola_vez(
+            f"platos_mas_vendidos:{restaurante_id}",
+            lambda: db["reporte_platos_mas_vendidos"].find(filtro, {"refrescado": 0}).to_list()
+        )
 
-        return {"platos_mas_vendidos": resultados}
+        return responder({"platos_mas_vendidos": resultados})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 #5.2.2 calificaciones promedio de los restaurantes con más de 10 reseñas
+# Se leen los contadores de cada restaurante con un rango indexado (idx_resenas_calificacion)
 @app.get("/reportes/calificaciones_promedio_restaurantes")
-def calificaciones_promedio_restaurantes():
+async def calificaciones_promedio_restaurantes():
     try:
-        pipeline = [
-            # Filtramos las reseñas de tipo "restaurante"
-            {"$match": {"type": "restaurante"}},
-            
-            # Agrupamos por restaurante y contamos las reseñas
-            {
-                "$group": {
-                    "_id": "$reviewed_id",
-                    "total_reseñas": {"$count": {}},
-                    "calificacion_promedio": {"$avg": "$calificacion"}
-                }
-            },
-            
-            # Filtramos los restaurantes que tienen más de 10 reseñas
-            {
-                "$match": {
-                    "total_reseñas": {"$gt": 10}
-                }
-            },
-            
-            # Buscamos la información del restaurante (nombre, etc.)
-            {
-                "$lookup": {
-                    "from": "restaurantes",
-                    "localField": "_id",
-                    "foreignField": "_id",
-                    "as": "restaurante_info"
-                }
-            },
-            
-            # Desempaquetamos la información del restaurante
-            {"$unwind": "$restaurante_info"},
-            
-            # Proyectamos el resultado final con la calificación promedio y el nombre del restaurante
-            {
-                "$project": {
-                    "restaurante_nombre": "$restaurante_info.nombre",  # Nombre del restaurante
-                    "calificacion_promedio": 1,  # La calificación promedio
-                    "total_reseñas": 1  # El total de reseñas
+        resultados = await una_sola_vez(
+            "calificaciones_promedio_restaurantes",
+            lambda: db["restaurantes"].find(
+                {"resenas_total": {"$gt": 10}},
+                {
+                    "restaurante_nombre": "$nombre",
+                    "calificacion_promedio": 1,
+                    "total_reseñas": "$resenas_total"
                 }
-            },
-            
-            # Ordenamos los resultados por calificación promedio de forma descendente
-            {
-                "$sort": {"calificacion_promedio": -1}
-            }
-        ]
-        
-        # Ejecutamos la agregación en la colección de reseñas
-        resultados = list(db["resenas"].aggregate(pipeline))
-        
-        # Convertimos ObjectId a string en caso de que sea necesario
-        resultados = parse_objectid(resultados)
+            ).sort("calificacion_promedio", -1).to_list()
+        )
         
-        return {"calificaciones_promedio_restaurantes": resultados}
+        return responder({"calificaciones_promedio_restaurantes": resultados})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Reconstruye desde las reseñas los contadores de calificación de todos los restaurantes
+@app.post("/reportes/calificaciones/reconciliar")
+async def reconciliar_calificaciones_restaurantes():
+    try:
+        cursor = await db["restaurantes"].aggregate(pipeline_reconciliar_calificaciones())
+        await cursor.to_list()
+
+        restaurantes = await db["restaurantes"].find({}, {"nombre": 1}).to_list()
+        await invalidar_restaurantes(restaurantes)
+
+        return {"mensaje": f"Calificaciones de {len(restaurantes)} restaurantes reconciliadas"}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 #5.3 Edición de items del menú
 @app.put("/menu/ingredientes/{nombre_item}")
-def editar_ingredientes(nombre_item: str, body: IngredienteChange):
+async def editar_ingredientes(nombre_item: str, body: IngredienteChange):
     # Buscar el item en el menú por nombre, insensible a mayúsculas
-    item = db["menu_items"].find_one({"nombre": {"$regex": f"^{re.escape(nombre_item)}$", "$options": "i"}})
+    item = await db["menu_items"].find_one({"nombre": nombre_item}, collation=COLACION_CI)
     if not item:
         raise HTTPException(status_code=404, detail="Item no encontrado")
 
     if body.accion == "agregar" and body.nombre:
         # Agregar un ingrediente
-        db["menu_items"].update_one(
+        await db["menu_items"].update_one(
             {"_id": item["_id"]},
             {"$push": {"ingredientes": body.nombre}}
         )
     elif body.accion == "quitar" and body.nombre:
         # Eliminar un ingrediente
-        db["menu_items"].update_one(
+        await db["menu_items"].update_one(
             {"_id": item["_id"]},
             {"$pull": {"ingredientes": body.nombre}}
         )
 
+    await cache.invalidar(clave_menu_nombre(nombre_item), clave_menu_nombre(item["nombre"]))
+
     # Obtener el item actualizado
-    item_actualizado = db["menu_items"].find_one({"_id": item["_id"]})
+    item_actualizado = await db["menu_items"].find_one({"_id": item["_id"]})
     if item_actualizado:
-        return parse_objectid(item_actualizado)
+        return responder(item_actualizado)
     else:
         raise HTTPException(status_code=500, detail="Error al actualizar el item")
-    
-@app.post("/restaurantes/bulk")
-def crear_restaurantes_bulk(restaurantes: List[RestauranteIn]):
-    operaciones = [InsertOne(r.dict()) for r in restaurantes]
-    resultado = db["restaurantes"].bulk_write(operaciones)
-    return {"mensaje": f"{resultado.inserted_count} restaurantes creados"}
+
+#5.4 Reportes de ventas sobre los acumulados diarios (ventas_diarias)
+# Un año de ventas se lee de unos 365 documentos por restaurante e item en lugar de recorrer las órdenes
+ORDENES_VENTAS = ("cantidad", "neto", "bruto", "ordenes")
+
+def filtro_ventas(desde, hasta, estado, restaurante_id=None):
+    estado = estado_canonico(estado)
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' no puede ser posterior a 'hasta'")
+
+    filtro = {}
+    if restaurante_id is not None:
+        if not ObjectId.is_valid(restaurante_id):
+            raise HTTPException(status_code=400, detail="ID de restaurante inválido")
+        filtro["restaurante_id"] = ObjectId(restaurante_id)
+    filtro["estado"] = estado
+    if desde or hasta:
+        filtro["dia"] = {}
+        if desde:
+            filtro["dia"]["$gte"] = datetime.combine(desde, datetime.min.time())
+        if hasta:
+            filtro["dia"]["$lte"] = datetime.combine(hasta, datetime.min.time())
+    return filtro
+
+# Agrupa los acumulados y redondea los montos
+def agrupar_ventas(agrupar_por):
+    return [
+        {
+            "$group": {
+                "_id": agrupar_por,
+                "cantidad": {"$sum": "$cantidad"},
+                "bruto": {"$sum": "$bruto"},
+                "descuento": {"$sum": "$descuento"},
+                "ordenes": {"$sum": "$ordenes"}
+            }
+        },
+        {
+            "$set": {
+                "bruto": {"$round": ["$bruto", 2]},
+                "descuento": {"$round": ["$descuento", 2]},
+                "neto": {"$round": [{"$subtract": ["$bruto", "$descuento"]}, 2]}
+            }
+        }
+    ]
+
+async def reporte_ventas(clave, pipeline):
+    async def calcular():
+        cursor = await db["ventas_diarias"].aggregate(pipeline)
+        return await cursor.to_list()
+
+    try:
+        return await una_sola_vez(clave, calcular)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def validar_orden_ventas(orden):
+    if orden not in ORDENES_VENTAS:
+        raise HTTPException(status_code=400, detail=f"'orden' debe ser uno de: {', '.join(ORDENES_VENTAS)}")
+
+#5.4.1 Platos más vendidos en un rango de fechas (top N)
+@app.get("/reportes/ventas/platos")
+async def ventas_por_plato(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    estado: str = "Entregado",
+    restaurante_id: Optional[str] = None,
+    top: int = Query(10, ge=1, le=PAGINA_MAX),
+    orden: str = "cantidad"
+):
+    validar_orden_ventas(orden)
+    filtro = filtro_ventas(desde, hasta, estado, restaurante_id)
+    pipeline = [
+        {"$match": filtro},
+        *agrupar_ventas({"item_id": "$item_id", "restaurante_id": "$restaurante_id"}),
+        {"$sort": {orden: -1, "_id": 1}},
+        {"$limit": top},
+        # Solo se buscan los nombres de los platos que entran en el top
+        {"$lookup": {"from": "menu_items", "localField": "_id.item_id", "foreignField": "_id", "as": "plato_info"}},
+        {
+            "$project": {
+                "_id": 0,
+                "item_id": "$_id.item_id",
+                "restaurante_id": "$_id.restaurante_id",
+                "plato": {"$first": "$plato_info.nombre"},
+                "cantidad": 1, "bruto": 1, "descuento": 1, "neto": 1, "ordenes": 1
+            }
+        }
+    ]
+    resultados = await reporte_ventas(f"ventas:platos:{desde}:{hasta}:{estado}:{restaurante_id}:{top}:{orden}", pipeline)
+    return responder({"platos": resultados})
+
+#5.4.2 Restaurantes con más ventas en un rango de fechas (top N)
+@app.get("/reportes/ventas/restaurantes")
+async def ventas_por_restaurante(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    estado: str = "Entregado",
+    top: int = Query(10, ge=1, le=PAGINA_MAX),
+    orden: str = "neto"
+):
+    validar_orden_ventas(orden)
+    filtro = filtro_ventas(desde, hasta, estado)
+    pipeline = [
+        {"$match": filtro},
+        *agrupar_ventas("$restaurante_id"),
+        {"$sort": {orden: -1, "_id": 1}},
+        {"$limit": top},
+        {"$lookup": {"from": "restaurantes", "localField": "_id", "foreignField": "_id", "as": "restaurante_info"}},
+        {
+            "$project": {
+                "_id": 0,
+                "restaurante_id": "$_id",
+                "restaurante_nombre": {"$first": "$restaurante_info.nombre"},
+                "cantidad": 1, "bruto": 1, "descuento": 1, "neto": 1, "ordenes": 1
+            }
+        }
+    ]
+    resultados = await reporte_ventas(f"ventas:restaurantes:{desde}:{hasta}:{estado}:{top}:{orden}", pipeline)
+    return responder({"restaurantes": resultados})
+
+#5.4.3 Serie diaria de ventas en un rango de fechas (de todos los restaurantes o de uno)
+@app.get("/reportes/ventas/diarias")
+async def ventas_diarias(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    estado: str = "Entregado",
+    restaurante_id: Optional[str] = None
+):
+    filtro = filtro_ventas(desde, hasta, estado, restaurante_id)
+    pipeline = [
+        {"$match": filtro},
+        *agrupar_ventas("$dia"),
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "dia": "$_id", "cantidad": 1, "bruto": 1, "descuento": 1, "neto": 1, "ordenes": 1}}
+    ]
+    resultados = await reporte_ventas(f"ventas:diarias:{desde}:{hasta}:{estado}:{restaurante_id}", pipeline)
+    return responder({"dias": resultados})
@@ -0,0 +1,424 @@
+# Benchmark de punta a punta de la API
+# Siembra una base local (DB_NAME, por defecto proyecto2-bench) con dataFaker.py --formato mongo a una
+# escala y semilla fijas, recorre todas las rutas (listas, búsquedas, reportes y escrituras por lote)
+# en el mismo proceso (httpx + ASGITransport) y/o por HTTP contra uvicorn en 127.0.0.1, y mide por ruta
+# p50/p95/p99, solicitudes por segundo y el pico de RSS del proceso que atiende.
+# Los resultados se guardan en JSON y se pueden comparar contra una línea base guardada.
+# Todo corre en la misma máquina: con --lanzar-mongod se levanta un mongod temporal sin red.
+# Uso: python bench_api.py [--escala 1] [--modo inproceso|http|ambos] [--repeticiones 200]
+#      [--lanzar-mongod] [--guardar-base bench_base.json] [--comparar bench_base.json]
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager, asynccontextmanager
+from datetime import datetime
+
+import httpx
+import numpy as np
+from pymongo import MongoClient
+
+
+# ========== Base de datos local ==========
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# mongod temporal en 127.0.0.1 con su propia carpeta de datos; se borra al terminar
+@contextmanager
+def mongod_temporal():
+    carpeta = tempfile.mkdtemp(prefix="bench_mongod_")
+    puerto = puerto_libre()
+    proceso = subprocess.Popen(
+        ["mongod", "--dbpath", carpeta, "--port", str(puerto), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    uri = f"mongodb://127.0.0.1:{puerto}"
+    try:
+        client = MongoClient(uri, serverSelectionTimeoutMS=30000)
+        client.admin.command("ping")
+        client.close()
+        yield uri
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+# Borra la base y la vuelve a llenar con dataFaker.py; deja índices, contadores y reportes listos
+def sembrar(escala, semilla, procesos=None):
+    import dataFaker
+    import mongoimport
+
+    client = MongoClient(mongoimport.MONGO_URI)
+    client.drop_database(mongoimport.DB_NAME)
+
+    totales = {c: max(1, round(base * escala)) for c, base in dataFaker.TOTALES_BASE.items()}
+    totales["menu_items"] = max(totales["menu_items"], totales["restaurantes"])
+    params = {
+        "semilla": semilla,
+        "fecha_fin": "2025-06-01",
+        "filas_por_bloque": dataFaker.FILAS_POR_BLOQUE,
+        "salida": "Data",
+        "formato": "mongo",
+    }
+    inicio = time.perf_counter()
+    dataFaker.generar(totales, params, procesos)
+    mongoimport.finalizar_importacion()
+    print(f"🌱 Base {mongoimport.DB_NAME} sembrada en {time.perf_counter() - inicio:.1f}s: {totales}")
+    return totales
+
+# Valores reales de la base para armar las solicitudes
+def muestras(db, cantidad):
+    usuarios = list(db.usuarios.find({}, {"correo": 1, "direccion.municipio": 1}).limit(cantidad))
+    restaurante = db.restaurantes.find_one()
+    menu = db.menu_items.find_one()
+    return {
+        "usuarios": usuarios,
+        "restaurante": restaurante,
+        "menu": menu,
+        "orden": db.ordenes.find_one({}, {"_id": 1}),
+        "resena": db.resenas.find_one({}, {"_id": 1}),
+        "ordenes": [o["_id"] for o in db.ordenes.find({}, {"_id": 1}).limit(200)],
+        "resenas_a_borrar": [r["_id"] for r in db.resenas.find({}, {"_id": 1}).sort("_id", -1).limit(cantidad)],
+        "restaurantes": [r["_id"] for r in db.restaurantes.find({}, {"_id": 1}).limit(50)],
+        "items": [m["_id"] for m in db.menu_items.find({}, {"_id": 1}).limit(50)],
+    }
+
+
+# ========== Escenarios ==========
+# Cada escenario arma la solicitud número i a partir de las muestras: (método, url, opciones de httpx).
+# Los "pesados" devuelven colecciones enteras y corren con menos repeticiones.
+
+ESTADOS = ["Preparando", "Entregado", "Pendiente", "Cancelado"]
+
+def ndjson(docs):
+    return "\n".join(json.dumps(d) for d in docs).encode()
+
+def resenas_nuevas(m, i, n=100):
+    return ndjson([
+        {
+            "reviewed_id": str(m["restaurantes"][(i + k) % len(m["restaurantes"])]),
+            "type": "restaurante",
+            "usuario_id": str(m["usuarios"][k % len(m["usuarios"])]["_id"]),
+            "comentario": "Benchmark",
+            "calificacion": 1 + (i + k) % 5,
+            "fecha": "2025-06-01T12:00:00",
+        }
+        for k in range(n)
+    ])
+
+def ordenes_nuevas(m, i, n=100):
+    return ndjson([
+        {
+            "usuario_id": str(m["usuarios"][k % len(m["usuarios"])]["_id"]),
+            "restaurante_id": str(m["restaurantes"][(i + k) % len(m["restaurantes"])]),
+            "fecha": "2025-06-01T12:00:00",
+            "estado": ESTADOS[(i + k) % len(ESTADOS)],
+            "items": [{"item_id": str(m["items"][(i + k) % len(m["items"])]), "cantidad": 1, "precio_unitario": 100.0, "descuento": 0.1}],
+        }
+        for k in range(n)
+    ])
+
+def restaurantes_nuevos(i, n=10):
+    return [
+        {
+            "nombre": f"Bench {i}-{k}",
+            "categoria": "Mexicana",
+            "direccion": {"nombre": "Centro", "municipio": "Bench", "ubicacion": {"latitud": 20.0, "longitud": -100.0}},
+        }
+        for k in range(n)
+    ]
+
+def usuario_nuevo(i):
+    return {
+        "nombre": f"Bench {i}",
+        "correo": f"bench.{i}.{time.time_ns()}@bench.local",
+        "telefono": "+52 000 000 0000",
+        "fecha_registro": "2025-06-01",
+        "direccion": {"nombre": "Centro", "municipio": "Bench", "ubicacion": {"latitud": 20.0, "longitud": -100.0}},
+    }
+
+def correo(m, i):
+    return m["usuarios"][i % len(m["usuarios"])]["correo"]
+
+def coordenadas(m):
+    lon, lat = m["restaurante"]["ubicacion_geo"]["coordinates"]
+    return {"lat": lat, "lng": lon}
+
+ESCENARIOS = [
+    # Listas
+    {"nombre": "GET /usuarios", "pesado": True, "solicitud": lambda m, i: ("GET", "/usuarios", {})},
+    {"nombre": "GET /usuarios?page_size", "solicitud": lambda m, i: ("GET", "/usuarios", {"params": {"page_size": 100}})},
+    {"nombre": "GET /usuarios?stream", "pesado": True, "solicitud": lambda m, i: ("GET", "/usuarios", {"params": {"stream": "true"}})},
+    {"nombre": "GET /menu", "pesado": True, "solicitud": lambda m, i: ("GET", "/menu", {})},
+    {"nombre": "GET /ordenes", "pesado": True, "solicitud": lambda m, i: ("GET", "/ordenes", {})},
+    {"nombre": "GET /ordenes?page_size", "solicitud": lambda m, i: ("GET", "/ordenes", {"params": {"page_size": 100}})},
+    {"nombre": "GET /reseñas?page_size", "solicitud": lambda m, i: ("GET", "/reseñas", {"params": {"page_size": 100}})},
+    {"nombre": "GET /usuarios/proyeccion", "pesado": True, "solicitud": lambda m, i: ("GET", "/usuarios/proyeccion", {})},
+    {"nombre": "GET /reseñas/ordenadas?page_size", "solicitud": lambda m, i: ("GET", "/reseñas/ordenadas", {"params": {"page_size": 100}})},
+    {"nombre": "GET /restaurantes/", "solicitud": lambda m, i: ("GET", "/restaurantes/", {"params": {"skip": 0, "limit": 10}})},
+    {"nombre": "GET /restaurantes/filtro", "solicitud": lambda m, i: ("GET", "/restaurantes/filtro",
+        {"params": {"ciudad": m["restaurante"]["ciudad"], "categoria": m["restaurante"]["categoria"]}})},
+    {"nombre": "GET /ordenes/mayores", "solicitud": lambda m, i: ("GET", "/ordenes/mayores", {"params": {"goal": 1000, "limit": 100}})},
+    {"nombre": "GET /usuarios/{id}/ordenes?resumen", "solicitud": lambda m, i: ("GET",
+        f"/usuarios/{m['usuarios'][i % len(m['usuarios'])]['_id']}/ordenes", {"params": {"resumen": "true"}})},
+    # Búsquedas por llave
+    {"nombre": "GET /usuario/{correo}", "solicitud": lambda m, i: ("GET", f"/usuario/{correo(m, i)}", {})},
+    {"nombre": "GET /restaurante/{nombre}", "solicitud": lambda m, i: ("GET", f"/restaurante/{m['restaurante']['nombre']}", {})},
+    {"nombre": "GET /restaurante/id/{id}", "solicitud": lambda m, i: ("GET", f"/restaurante/id/{m['restaurante']['_id']}", {})},
+    {"nombre": "GET /menu/{nombre}", "solicitud": lambda m, i: ("GET", f"/menu/{m['menu']['nombre']}", {})},
+    {"nombre": "GET /orden/{id}", "solicitud": lambda m, i: ("GET", f"/orden/{m['orden']['_id']}", {})},
+    {"nombre": "GET /resena/{id}", "solicitud": lambda m, i: ("GET", f"/resena/{m['resena']['_id']}", {})},
+    {"nombre": "GET /buscar/restaurantes", "solicitud": lambda m, i: ("GET", "/buscar/restaurantes", {"params": {"q": m["restaurante"]["ciudad"]}})},
+    {"nombre": "GET /buscar/menu", "solicitud": lambda m, i: ("GET", "/buscar/menu", {"params": {"q": m["menu"]["nombre"]}})},
+    {"nombre": "GET /restaurantes/cercanos", "solicitud": lambda m, i: ("GET", "/restaurantes/cercanos", {"params": coordenadas(m)})},
+    {"nombre": "GET /restaurantes/radio", "solicitud": lambda m, i: ("GET", "/restaurantes/radio", {"params": {**coordenadas(m), "metros": 500000}})},
+    # Reportes
+    {"nombre": "GET /restaurantes/por-ciudad", "solicitud": lambda m, i: ("GET", "/restaurantes/por-ciudad", {})},
+    {"nombre": "GET /reportes/usuarios_por_municipio", "solicitud": lambda m, i: ("GET", "/reportes/usuarios_por_municipio", {})},
+    {"nombre": "GET /reportes/platos_mas_vendidos", "solicitud": lambda m, i: ("GET", "/reportes/platos_mas_vendidos", {})},
+    {"nombre": "GET /reportes/calificaciones_promedio_restaurantes", "solicitud": lambda m, i: ("GET", "/reportes/calificaciones_promedio_restaurantes", {})},
+    {"nombre": "GET /reportes/ventas/platos", "solicitud": lambda m, i: ("GET", "/reportes/ventas/platos", {"params": {"top": 10}})},
+    {"nombre": "GET /reportes/ventas/restaurantes", "solicitud": lambda m, i: ("GET", "/reportes/ventas/restaurantes", {"params": {"top": 10}})},
+    {"nombre": "GET /reportes/ventas/diarias", "solicitud": lambda m, i: ("GET", "/reportes/ventas/diarias", {})},
+    # Escrituras
+    {"nombre": "POST /nuevoUsuario", "solicitud": lambda m, i: ("POST", "/nuevoUsuario", {"json": usuario_nuevo(i)})},
+    {"nombre": "POST /restaurantes/bulk (10)", "solicitud": lambda m, i: ("POST", "/restaurantes/bulk", {"json": restaurantes_nuevos(i)})},
+    {"nombre": "POST /ordenes/ingesta (100)", "solicitud": lambda m, i: ("POST", "/ordenes/ingesta", {"content": ordenes_nuevas(m, i)})},
+    {"nombre": "POST /resenas/ingesta (100)", "solicitud": lambda m, i: ("POST", "/resenas/ingesta", {"content": resenas_nuevas(m, i)})},
+    {"nombre": "PUT /actualizarEstadosOrdenes (20)", "solicitud": lambda m, i: ("PUT", "/actualizarEstadosOrdenes",
+        {"json": [{"id": str(o), "estado": ESTADOS[i % len(ESTADOS)]} for o in m["ordenes"][(i * 20) % 180:(i * 20) % 180 + 20]]})},
+    {"nombre": "PUT /actualizarUsuario/{correo}", "solicitud": lambda m, i: ("PUT", f"/actualizarUsuario/{correo(m, i)}",
+        {"json": {"telefono": f"+52 000 000 {i % 10000:04d}"}})},
+    {"nombre": "PUT /menu/ingredientes/{nombre}", "solicitud": lambda m, i: ("PUT", f"/menu/ingredientes/{m['menu']['nombre']}",
+        {"json": {"accion": "agregar" if i % 2 == 0 else "quitar", "nombre": "bench"}})},
+    {"nombre": "DELETE /resenas/{id}", "solicitud": lambda m, i: ("DELETE", f"/resenas/{m['resenas_a_borrar'][i % len(m['resenas_a_borrar'])]}", {})},
+]
+
+
+# ========== Clientes ==========
+
+# La API en el mismo proceso, con su lifespan (cliente de Mongo y refresco de reportes)
+@asynccontextmanager
+async def cliente_inproceso():
+    import API
+    async with API.lifespan(API.app):
+        transporte = httpx.ASGITransport(app=API.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=300) as cliente:
+            yield cliente, os.getpid()
+
+# uvicorn en 127.0.0.1 en un proceso aparte, con el mismo entorno (MONGO_URI, DB_NAME)
+@asynccontextmanager
+async def cliente_http(workers=1, limite_conexiones=100):
+    puerto = puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "API:app", "--host", "127.0.0.1", "--port", str(puerto),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    limites = httpx.Limits(max_connections=limite_conexiones, max_keepalive_connections=limite_conexiones)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{puerto}", timeout=300, limits=limites) as cliente:
+            for _ in range(300):
+                try:
+                    if (await cliente.get("/cache/estadisticas")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn no respondió a tiempo")
+            yield cliente, proceso.pid
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+
+# ========== Medición ==========
+
+# El pico de RSS (VmHWM) de un proceso en Linux; escribir 5 en clear_refs lo reinicia
+def reiniciar_pico_rss(pid):
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def pico_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def percentiles_ms(tiempos):
+    p50, p95, p99 = np.percentile(np.asarray(tiempos) * 1000, [50, 95, 99])
+    return round(float(p50), 3), round(float(p95), 3), round(float(p99), 3)
+
+async def enviar(cliente, solicitud):
+    metodo, url, opciones = solicitud
+    inicio = time.perf_counter()
+    respuesta = await cliente.request(metodo, url, **opciones)
+    return time.perf_counter() - inicio, respuesta.status_code, len(respuesta.content)
+
+async def medir_escenario(cliente, pid, escenario, m, repeticiones, calentamiento):
+    if escenario.get("pesado"):
+        repeticiones = max(5, repeticiones // 20)
+    for i in range(calentamiento):
+        await enviar(cliente, escenario["solicitud"](m, i))
+
+    reiniciar_pico_rss(pid)
+    tiempos, errores, bytes_totales = [], 0, 0
+    inicio = time.perf_counter()
+    for i in range(calentamiento, calentamiento + repeticiones):
+        duracion, estado, tamaño = await enviar(cliente, escenario["solicitud"](m, i))
+        tiempos.append(duracion)
+        errores += estado >= 400
+        bytes_totales += tamaño
+    total = time.perf_counter() - inicio
+
+    p50, p95, p99 = percentiles_ms(tiempos)
+    return {
+        "ruta": escenario["nombre"],
+        "solicitudes": repeticiones,
+        "errores": errores,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "solicitudes_por_seg": round(repeticiones / total, 2),
+        "bytes_por_respuesta": bytes_totales // repeticiones,
+        "pico_rss_mb": pico_rss_mb(pid),
+    }
+
+async def correr_modo(modo, m, args):
+    abrir = cliente_inproceso if modo == "inproceso" else cliente_http
+    resultados = []
+    async with abrir() as (cliente, pid):
+        for escenario in ESCENARIOS:
+            if args.filtro and args.filtro not in escenario["nombre"]:
+                continue
+            resultado = await medir_escenario(cliente, pid, escenario, m, args.repeticiones, args.calentamiento)
+            imprimir_fila(resultado)
+            resultados.append(resultado)
+    return resultados
+
+def imprimir_encabezado(modo):
+    print(f"\n📊 {modo}")
+    print(f"{'ruta':<52} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sol/s':>9} {'RSS MB':>8} {'err':>4}")
+
+def imprimir_fila(r):
+    rss = f"{r['pico_rss_mb']:.1f}" if r["pico_rss_mb"] is not None else "-"
+    print(f"{r['ruta']:<52} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+          f"{r['solicitudes_por_seg']:>9.1f} {rss:>8} {r['errores']:>4}")
+
+
+# ========== Línea base ==========
+
+# Compara contra la línea base: una ruta empeora si su p95 sube o sus solicitudes por segundo
+# bajan más que la tolerancia. Devuelve la lista de regresiones.
+def comparar(resultados, base, tolerancia):
+    regresiones = []
+    for modo, filas in resultados["modos"].items():
+        anteriores = {r["ruta"]: r for r in base.get("modos", {}).get(modo, [])}
+        print(f"\n🔍 {modo} contra la línea base ({base.get('fecha')})")
+        print(f"{'ruta':<52} {'p95 antes':>10} {'p95 ahora':>10} {'cambio':>8} {'sol/s':>8}")
+        for r in filas:
+            anterior = anteriores.get(r["ruta"])
+            if anterior is None:
+                print(f"{r['ruta']:<52} {'(nueva)':>10}")
+                continue
+            cambio_p95 = r["p95_ms"] / anterior["p95_ms"] - 1 if anterior["p95_ms"] else 0
+            cambio_rps = r["solicitudes_por_seg"] / anterior["solicitudes_por_seg"] - 1 if anterior["solicitudes_por_seg"] else 0
+            empeora = cambio_p95 > tolerancia or cambio_rps < -tolerancia
+            marca = "⚠️" if empeora else ""
+            print(f"{r['ruta']:<52} {anterior['p95_ms']:>10.2f} {r['p95_ms']:>10.2f} {cambio_p95:>+8.0%} {cambio_rps:>+8.0%} {marca}")
+            if empeora:
+                regresiones.append({"modo": modo, "ruta": r["ruta"], "cambio_p95": cambio_p95, "cambio_solicitudes_por_seg": cambio_rps})
+    return regresiones
+
+
+def preparar_entorno(args):
+    # Antes de importar API, dataFaker o mongoimport, que leen MONGO_URI y DB_NAME al cargarse
+    os.environ["MONGO_URI"] = args.uri
+    os.environ["DB_NAME"] = args.base
+
+def correr(args):
+    preparar_entorno(args)
+    if not args.reusar:
+        sembrar(args.escala, args.semilla, args.procesos)
+    db = MongoClient(args.uri)[args.base]
+
+    modos = ["inproceso", "http"] if args.modo == "ambos" else [args.modo]
+    resultados = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "escala": args.escala,
+        "semilla": args.semilla,
+        "repeticiones": args.repeticiones,
+        "maquina": {"python": platform.python_version(), "sistema": platform.platform(), "cpus": os.cpu_count()},
+        "modos": {},
+    }
+    for modo in modos:
+        # Las muestras se toman de nuevo en cada modo: el anterior ya borró sus reseñas
+        m = muestras(db, args.repeticiones + args.calentamiento)
+        imprimir_encabezado(modo)
+        resultados["modos"][modo] = asyncio.run(correr_modo(modo, m, args))
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados en {args.salida}")
+
+    if args.guardar_base:
+        shutil.copyfile(args.salida, args.guardar_base)
+        print(f"📌 Línea base guardada en {args.guardar_base}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.tolerancia)
+        print(f"\n{len(regresiones)} rutas empeoraron más de {args.tolerancia:.0%}.")
+        return 1 if regresiones else 0
+    return 0
+
+def argumentos_comunes(parser):
+    parser.add_argument("--uri", default="mongodb://127.0.0.1:27017", help="MongoDB local donde se siembra la base")
+    parser.add_argument("--base", default="proyecto2-bench", help="Base de datos del benchmark (se borra al sembrar)")
+    parser.add_argument("--lanzar-mongod", action="store_true", help="Levanta un mongod temporal en lugar de usar --uri")
+    parser.add_argument("--escala", type=float, default=1, help="Escala de dataFaker.py (1 = 35k órdenes)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos para sembrar")
+    parser.add_argument("--reusar", action="store_true", help="No vuelve a sembrar la base")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta de la API")
+    argumentos_comunes(parser)
+    parser.add_argument("--modo", choices=["inproceso", "http", "ambos"], default="ambos")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--calentamiento", type=int, default=10)
+    parser.add_argument("--filtro", default=None, help="Solo las rutas que contienen este texto")
+    parser.add_argument("--salida", default="bench_resultados.json")
+    parser.add_argument("--guardar-base", default=None, help="Guarda estos resultados como línea base")
+    parser.add_argument("--comparar", default=None, help="Línea base contra la que se comparan los resultados")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Cambio permitido en p95 y solicitudes/s")
+    args = parser.parse_args()
+
+    if args.lanzar_mongod:
+        with mongod_temporal() as uri:
+            args.uri = uri
+            codigo = correr(args)
+    else:
+        codigo = correr(args)
+    sys.exit(codigo)
@@ -0,0 +1,88 @@
+# Micro-benchmark de serialización BSON → JSON
+# Compara el camino anterior (parse_objectid + jsonable_encoder + json.dumps de FastAPI)
+# contra el serializador de una sola pasada de API.py
+# Uso: python bench_serializacion.py [--docs 20000] [--repeticiones 5]
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from API import a_json
+
+
+# Conversor recursivo que usaba la API antes del serializador
+def parse_objectid(obj):
+    if isinstance(obj, dict):
+        return {k: parse_objectid(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [parse_objectid(item) for item in obj]
+    elif isinstance(obj, ObjectId):
+        return str(obj)
+    else:
+        return obj
+
+# Lo que hacía cada endpoint: convertir ObjectIds y dejar que FastAPI codifique la respuesta
+def camino_anterior(docs):
+    contenido = jsonable_encoder([parse_objectid(d) for d in docs])
+    return json.dumps(contenido, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def camino_nuevo(docs):
+    return a_json(docs)
+
+# Órdenes con la misma forma que las importadas (items embebidos, ObjectIds y fechas)
+def generar_ordenes(n):
+    base = datetime(2024, 1, 1)
+    ordenes = []
+    for _ in range(n):
+        items = [
+            {
+                "item_id": ObjectId(),
+                "cantidad": random.randint(1, 3),
+                "precio_unitario": round(random.uniform(50, 300), 2),
+                "descuento": round(random.uniform(0, 0.3), 2),
+            }
+            for _ in range(random.randint(1, 5))
+        ]
+        ordenes.append({
+            "_id": ObjectId(),
+            "usuario_id": ObjectId(),
+            "restaurante_id": ObjectId(),
+            "fecha": base + timedelta(minutes=random.randint(0, 525600)),
+            "estado": random.choice(["Pendiente", "Preparando", "Entregado", "Cancelado"]),
+            "items": items,
+            "total": round(random.uniform(50, 1500), 2),
+        })
+    return ordenes
+
+def medir(funcion, docs, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(docs)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(docs) / mejor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de documentos")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    docs = generar_ordenes(args.docs)
+
+    assert json.loads(camino_anterior(docs[:100])) == json.loads(camino_nuevo(docs[:100]))
+
+    anterior = medir(camino_anterior, docs, args.repeticiones)
+    nuevo = medir(camino_nuevo, docs, args.repeticiones)
+
+    print(f"📊 {args.docs} órdenes, mejor de {args.repeticiones} repeticiones")
+    print(f"- parse_objectid + jsonable_encoder: {anterior:,.0f} docs/s")
+    print(f"- serializador de una pasada:        {nuevo:,.0f} docs/s")
+    print(f"- mejora: {nuevo / anterior:.1f}x")
@@ -0,0 +1,198 @@
+# Caché de lectura para documentos individuales (restaurantes, items del menú, órdenes)
+# Guarda el JSON ya serializado con expulsión LRU por tamaño y expiración por TTL.
+# Cada clave lleva un número de versión que las escrituras incrementan al invalidar: una lectura
+# que empezó antes de una escritura no puede guardar el valor viejo después de ella.
+#
+# Backends:
+# - "memoria": diccionario ordenado dentro del proceso (por defecto)
+# - "sqlite": archivo local compartido por todos los workers de uvicorn en la misma máquina
+#
+# Los métodos son async: el backend sqlite hace llamadas bloqueantes (y espera los bloqueos de otros
+# workers), así que las corre en el pool de hilos para no detener el event loop de la API.
+
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class CacheMemoria:
+    def __init__(self, max_entradas, ttl):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.datos = OrderedDict()  # clave → (expira, valor)
+        self.versiones = {}
+        self.reinicios = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    async def obtener(self, clave):
+        entrada = self.datos.get(clave)
+        if entrada is None or entrada[0] < time.monotonic():
+            if entrada is not None:
+                del self.datos[clave]
+            self.fallos += 1
+            return None
+        self.datos.move_to_end(clave)
+        self.aciertos += 1
+        return entrada[1]
+
+    async def version(self, clave):
+        return (self.reinicios, self.versiones.get(clave, 0))
+
+    async def guardar(self, clave, valor, version):
+        if await self.version(clave) != version:
+            return
+        self.datos[clave] = (time.monotonic() + self.ttl, valor)
+        self.datos.move_to_end(clave)
+        while len(self.datos) > self.max_entradas:
+            self.datos.popitem(last=False)
+            self.expulsiones += 1
+
+    async def invalidar(self, *claves):
+        for clave in claves:
+            self.datos.pop(clave, None)
+            self.versiones[clave] = self.versiones.get(clave, 0) + 1
+        # Las versiones no crecen sin límite: al vaciarlas se invalida cualquier carga en curso
+        if len(self.versiones) > 10 * self.max_entradas:
+            self.versiones.clear()
+            self.reinicios += 1
+
+    async def estadisticas(self):
+        return {
+            "backend": "memoria",
+            "entradas": len(self.datos),
+            "max_entradas": self.max_entradas,
+            "ttl_seg": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "expulsiones": self.expulsiones,
+        }
+
+
+class CacheSQLite:
+    def __init__(self, ruta, max_entradas, ttl):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.local = threading.local()
+        self.aciertos = 0
+        self.fallos = 0
+        con = self.conexion()
+        con.execute("CREATE TABLE IF NOT EXISTS entradas (clave TEXT PRIMARY KEY, valor BLOB, expira REAL, usado REAL)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_usado ON entradas (usado)")
+        con.execute("CREATE TABLE IF NOT EXISTS versiones (clave TEXT PRIMARY KEY, version INTEGER)")
+        con.execute("CREATE TABLE IF NOT EXISTS reinicios (id INTEGER PRIMARY KEY CHECK (id = 0), valor INTEGER)")
+        con.execute("INSERT OR IGNORE INTO reinicios (id, valor) VALUES (0, 0)")
+
+    # Una conexión por hilo; WAL permite lecturas concurrentes desde varios procesos
+    def conexion(self):
+        con = getattr(self.local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self.local.con = con
+        return con
+
+    async def obtener(self, clave):
+        return await asyncio.to_thread(self.obtener_bloqueante, clave)
+
+    async def version(self, clave):
+        return await asyncio.to_thread(self.version_bloqueante, clave)
+
+    async def guardar(self, clave, valor, version):
+        await asyncio.to_thread(self.guardar_bloqueante, clave, valor, version)
+
+    async def invalidar(self, *claves):
+        await asyncio.to_thread(self.invalidar_bloqueante, claves)
+
+    async def estadisticas(self):
+        return await asyncio.to_thread(self.estadisticas_bloqueante)
+
+    # Las versiones van junto con el número de reinicios, igual que en el backend de memoria
+    def version_bloqueante(self, clave, con=None):
+        con = con or self.conexion()
+        reinicios = con.execute("SELECT valor FROM reinicios WHERE id = 0").fetchone()[0]
+        fila = con.execute("SELECT version FROM versiones WHERE clave = ?", (clave,)).fetchone()
+        return (reinicios, fila[0] if fila else 0)
+
+    def obtener_bloqueante(self, clave):
+        con = self.conexion()
+        fila = con.execute("SELECT valor, expira FROM entradas WHERE clave = ?", (clave,)).fetchone()
+        ahora = time.time()
+        if fila is None or fila[1] < ahora:
+            if fila is not None:
+                con.execute("DELETE FROM entradas WHERE clave = ? AND expira < ?", (clave, ahora))
+            self.fallos += 1
+            return None
+        con.execute("UPDATE entradas SET usado = ? WHERE clave = ?", (ahora, clave))
+        self.aciertos += 1
+        return fila[0]
+
+    def guardar_bloqueante(self, clave, valor, version):
+        con = self.conexion()
+        ahora = time.time()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            if self.version_bloqueante(clave, con) == version:
+                con.execute(
+                    "INSERT OR REPLACE INTO entradas (clave, valor, expira, usado) VALUES (?, ?, ?, ?)",
+                    (clave, valor, ahora + self.ttl, ahora)
+                )
+                con.execute(
+                    "DELETE FROM entradas WHERE clave IN "
+                    "(SELECT clave FROM entradas ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entradas,)
+                )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+
+    def invalidar_bloqueante(self, claves):
+        con = self.conexion()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            for clave in claves:
+                con.execute("DELETE FROM entradas WHERE clave = ?", (clave,))
+                con.execute(
+                    "INSERT INTO versiones (clave, version) VALUES (?, 1) "
+                    "ON CONFLICT(clave) DO UPDATE SET version = version + 1",
+                    (clave,)
+                )
+            # Las versiones no crecen sin límite: al vaciarlas se invalida cualquier carga en curso
+            if con.execute("SELECT COUNT(*) FROM versiones").fetchone()[0] > 10 * self.max_entradas:
+                con.execute("DELETE FROM versiones")
+                con.execute("UPDATE reinicios SET valor = valor + 1 WHERE id = 0")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+
+    def estadisticas_bloqueante(self):
+        entradas = self.conexion().execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "ruta": self.ruta,
+            "entradas": entradas,
+            "max_entradas": self.max_entradas,
+            "ttl_seg": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+        }
+
+
+# Crea el backend configurado con CACHE_BACKEND, CACHE_MAX_ENTRADAS y CACHE_TTL_SEG
+def crear_cache():
+    backend = os.getenv("CACHE_BACKEND", "memoria")
+    max_entradas = int(os.getenv("CACHE_MAX_ENTRADAS", 10000))
+    ttl = float(os.getenv("CACHE_TTL_SEG", 300))
+    if backend == "sqlite":
+        return CacheSQLite(os.getenv("CACHE_SQLITE_RUTA", "cache_api.sqlite3"), max_entradas, ttl)
+    if backend == "memoria":
+        return CacheMemoria(max_entradas, ttl)
+    raise ValueError(f"Backend de caché desconocido: {backend}")
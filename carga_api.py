@@ -0,0 +1,352 @@
+# Generador de carga con la mezcla de tráfico del frontend (proyecto2-frontend/src/pages)
+# Cada sesión repite lo que hace una página de React:
+# - login:         Login.tsx busca al usuario por correo
+# - restaurantes:  Restaurantes.tsx carga páginas de 10 con un skip al azar y filtra por ciudad
+# - ordenes:       Ordenes.tsx carga todas las órdenes, manda un lote de estados y las vuelve a cargar
+# - reportes:      Reportes.tsx pide los tres reportes a la vez
+# - usuarios:      Usuarios.tsx carga todos los usuarios, borra un municipio y los vuelve a descargar
+#                  (el municipio lo crea antes la misma sesión con POST /nuevoUsuario, como el registro
+#                  de Login.tsx, para que la base no se vacíe durante la prueba)
+#
+# Dos modelos de carga:
+# - cerrado: N usuarios concurrentes, cada uno empieza otra sesión al terminar la anterior (--usuarios 1,2,4,8)
+# - abierto: sesiones que llegan al azar (Poisson) a una tasa fija, terminen o no las anteriores
+#            (--tasas 1,2,5,10); la latencia se mide desde la llegada programada
+# Por cada nivel se reporta throughput, p50/p90/p95/p99/p99.9 y errores, y al final el punto de
+# saturación: el último nivel que cumple --slo-p99-ms y --max-errores y en el que el throughput sigue
+# creciendo (cerrado) o alcanza la tasa ofrecida (abierto).
+#
+# Sin --url siembra la base como bench_api.py y levanta uvicorn en 127.0.0.1; con --url apunta a un
+# despliegue existente y toma los correos, órdenes y ciudades de la propia API.
+# Uso: python carga_api.py [--modelo cerrado|abierto] [--usuarios 1,2,4,8,16,32] [--tasas 1,2,5,10,20]
+#      [--duracion 30] [--mezcla login=40,restaurantes=30,ordenes=10,reportes=10,usuarios=10]
+#      [--url http://127.0.0.1:8000] [--workers 1] [--salida carga_resultados.json]
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+import bench_api
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+ESTADOS = ["Pendiente", "Preparando", "Entregado", "Cancelado"]
+MEZCLA_BASE = "login=40,restaurantes=30,ordenes=10,reportes=10,usuarios=10"
+
+
+# ========== Datos de la API ==========
+
+# Correos, órdenes y ciudades reales, pedidos a la misma API para funcionar contra cualquier despliegue
+async def muestras_api(cliente):
+    usuarios = (await cliente.get("/usuarios", params={"page_size": 200})).json()["items"]
+    ordenes = (await cliente.get("/ordenes", params={"page_size": 200})).json()["items"]
+    restaurantes = (await cliente.get("/restaurantes/", params={"skip": 0, "limit": 50})).json()
+    return {
+        "correos": [u["correo"] for u in usuarios],
+        "ordenes": [o["_id"] for o in ordenes],
+        "ciudades": sorted({r["ciudad"] for r in restaurantes if r.get("ciudad")}),
+    }
+
+
+# ========== Sesiones (una por página del frontend) ==========
+
+class Registro:
+    def __init__(self):
+        self.solicitudes = []  # (sesión, ruta, segundos, ok)
+        self.sesiones = []     # (sesión, segundos, ok)
+
+    async def pedir(self, cliente, sesion, ruta, metodo, url, **opciones):
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, url, **opciones)
+            ok = respuesta.status_code < 400
+        except httpx.HTTPError:
+            respuesta, ok = None, False
+        self.solicitudes.append((sesion, ruta, time.perf_counter() - inicio, ok))
+        if not ok:
+            raise SesionFallida(ruta)
+        return respuesta
+
+class SesionFallida(Exception):
+    pass
+
+# Login.tsx: GET /usuario/{correo}
+async def sesion_login(cliente, registro, m, rng):
+    await registro.pedir(cliente, "login", "/usuario/{correo}", "GET", f"/usuario/{rng.choice(m['correos'])}")
+
+# Restaurantes.tsx: páginas de 10 con skip al azar entre 0 y 40 (como obtenerTodos) y un filtro por ciudad
+async def sesion_restaurantes(cliente, registro, m, rng, paginas=3):
+    for _ in range(paginas):
+        await registro.pedir(cliente, "restaurantes", "/restaurantes", "GET", "/restaurantes",
+                             params={"skip": rng.randrange(40), "limit": 10})
+    if m["ciudades"]:
+        await registro.pedir(cliente, "restaurantes", "/restaurantes/filtro", "GET", "/restaurantes/filtro",
+                             params={"ciudad": rng.choice(m["ciudades"])})
+
+# Ordenes.tsx: carga todas, manda un lote de estados (sendMultipleUpdates) y vuelve a cargar todas
+async def sesion_ordenes(cliente, registro, m, rng, lote=5):
+    await registro.pedir(cliente, "ordenes", "/ordenes", "GET", "/ordenes")
+    cambios = [{"id": o, "estado": rng.choice(ESTADOS)} for o in rng.sample(m["ordenes"], min(lote, len(m["ordenes"])))]
+    await registro.pedir(cliente, "ordenes", "/actualizarEstadosOrdenes", "PUT", "/actualizarEstadosOrdenes", json=cambios)
+    await registro.pedir(cliente, "ordenes", "/ordenes", "GET", "/ordenes")
+
+REPORTES = ["/reportes/usuarios_por_municipio", "/reportes/platos_mas_vendidos", "/reportes/calificaciones_promedio_restaurantes"]
+
+# Reportes.tsx: los tres reportes al mismo tiempo
+async def sesion_reportes(cliente, registro, m, rng):
+    await asyncio.gather(*(registro.pedir(cliente, "reportes", ruta, "GET", ruta) for ruta in REPORTES))
+
+# Usuarios.tsx: carga todos, borra un municipio (handleEliminarPorMunicipio) y vuelve a descargar todos
+async def sesion_usuarios(cliente, registro, m, rng):
+    municipio = f"Carga {uuid.uuid4().hex[:12]}"
+    await registro.pedir(cliente, "usuarios", "/nuevoUsuario", "POST", "/nuevoUsuario", json={
+        "nombre": "Carga",
+        "correo": f"{municipio.replace(' ', '.').lower()}@carga.local",
+        "telefono": "+52 000 000 0000",
+        "fecha_registro": "2025-06-01",
+        "direccion": {"nombre": "Centro", "municipio": municipio, "ubicacion": {"latitud": 20.0, "longitud": -100.0}},
+    })
+    await registro.pedir(cliente, "usuarios", "/usuarios", "GET", "/usuarios")
+    await registro.pedir(cliente, "usuarios", "/usuarios/municipio/{municipio}", "DELETE", f"/usuarios/municipio/{municipio}")
+    await registro.pedir(cliente, "usuarios", "/usuarios", "GET", "/usuarios")
+
+SESIONES = {
+    "login": sesion_login,
+    "restaurantes": sesion_restaurantes,
+    "ordenes": sesion_ordenes,
+    "reportes": sesion_reportes,
+    "usuarios": sesion_usuarios,
+}
+
+def leer_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        if nombre not in SESIONES:
+            raise argparse.ArgumentTypeError(f"Sesión desconocida: {nombre} (válidas: {', '.join(SESIONES)})")
+        mezcla[nombre] = float(peso)
+    return mezcla
+
+def leer_niveles(texto):
+    return [float(x) for x in texto.split(",")]
+
+# Corre una sesión y guarda su duración total; `inicio` es la llegada programada en el modelo abierto
+async def correr_sesion(cliente, registro, nombre, m, rng, inicio=None):
+    inicio = inicio if inicio is not None else time.perf_counter()
+    try:
+        await SESIONES[nombre](cliente, registro, m, rng)
+        ok = True
+    except SesionFallida:
+        ok = False
+    registro.sesiones.append((nombre, time.perf_counter() - inicio, ok))
+
+
+# ========== Modelos de carga ==========
+
+async def carga_cerrada(cliente, m, mezcla, usuarios, duracion, pausa, semilla):
+    registro = Registro()
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    fin = time.perf_counter() + duracion
+
+    async def usuario(k):
+        rng = random.Random(semilla * 1000 + k)
+        while time.perf_counter() < fin:
+            await correr_sesion(cliente, registro, rng.choices(nombres, pesos)[0], m, rng)
+            if pausa:
+                await asyncio.sleep(rng.expovariate(1 / pausa))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario(k) for k in range(int(usuarios))))
+    return registro, time.perf_counter() - inicio, 0
+
+async def carga_abierta(cliente, m, mezcla, tasa, duracion, max_en_curso, semilla):
+    registro = Registro()
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    rng = random.Random(semilla)
+    tareas = set()
+    descartadas = 0
+
+    inicio = time.perf_counter()
+    llegada = inicio
+    while True:
+        llegada += rng.expovariate(tasa)
+        if llegada - inicio >= duracion:
+            break
+        await asyncio.sleep(max(0, llegada - time.perf_counter()))
+        # Si el servidor ya no da abasto, las sesiones se acumulan; pasado el tope se descartan
+        if len(tareas) >= max_en_curso:
+            descartadas += 1
+            continue
+        tarea = asyncio.create_task(correr_sesion(
+            cliente, registro, rng.choices(nombres, pesos)[0], m, random.Random(rng.random()), llegada
+        ))
+        tareas.add(tarea)
+        tarea.add_done_callback(tareas.discard)
+    await asyncio.gather(*tareas)
+    return registro, time.perf_counter() - inicio, descartadas
+
+
+# ========== Resultados ==========
+
+def percentiles_ms(tiempos):
+    if not tiempos:
+        return {f"p{p:g}": None for p in PERCENTILES}
+    valores = np.percentile(np.asarray(tiempos) * 1000, PERCENTILES)
+    return {f"p{p:g}": round(float(v), 2) for p, v in zip(PERCENTILES, valores)}
+
+def resumir(nivel, registro, segundos, descartadas):
+    solicitudes = registro.solicitudes
+    errores = sum(not ok for *_, ok in solicitudes)
+    resultado = {
+        "nivel": nivel,
+        "segundos": round(segundos, 2),
+        "solicitudes": len(solicitudes),
+        "solicitudes_por_seg": round(len(solicitudes) / segundos, 2),
+        "sesiones_por_seg": round(len(registro.sesiones) / segundos, 2),
+        "errores": round(errores / len(solicitudes), 4) if solicitudes else 0,
+        "descartadas": descartadas,
+        "latencia_ms": percentiles_ms([t for _, _, t, _ in solicitudes]),
+        "sesiones": {},
+        "rutas": {},
+    }
+    for nombre in sorted({s for s, _, _ in registro.sesiones}):
+        tiempos = [t for s, t, _ in registro.sesiones if s == nombre]
+        resultado["sesiones"][nombre] = {"cantidad": len(tiempos), **percentiles_ms(tiempos)}
+    for ruta in sorted({r for _, r, _, _ in solicitudes}):
+        tiempos = [t for _, r, t, _ in solicitudes if r == ruta]
+        resultado["rutas"][ruta] = {"cantidad": len(tiempos), **percentiles_ms(tiempos)}
+    return resultado
+
+def cumple(r, args):
+    p99 = r["latencia_ms"]["p99"]
+    return p99 is not None and p99 <= args.slo_p99_ms and r["errores"] <= args.max_errores and r["descartadas"] == 0
+
+# Último nivel sostenible: cumple el SLO y, en el modelo cerrado, todavía sube el throughput al menos
+# un --crecimiento-minimo respecto al nivel anterior; en el abierto, completa ~la tasa ofrecida
+def punto_de_saturacion(niveles, args):
+    sostenible = None
+    for anterior, r in zip([None] + niveles, niveles):
+        if not cumple(r, args):
+            break
+        if args.modelo == "cerrado" and anterior is not None:
+            if r["sesiones_por_seg"] < anterior["sesiones_por_seg"] * (1 + args.crecimiento_minimo):
+                break
+        if args.modelo == "abierto" and r["sesiones_por_seg"] < r["nivel"] * 0.95:
+            break
+        sostenible = r
+    return sostenible
+
+def imprimir_encabezado(modelo):
+    unidad = "usuarios" if modelo == "cerrado" else "sesiones/s"
+    print(f"\n📈 Modelo {modelo}")
+    print(f"{unidad:>10} {'sol/s':>8} {'ses/s':>7} " + " ".join(f"{f'p{p:g} ms':>9}" for p in PERCENTILES) + f" {'errores':>8} {'desc':>5}")
+
+def imprimir_nivel(r):
+    latencias = " ".join(f"{v:>9.1f}" if v is not None else f"{'-':>9}" for v in r["latencia_ms"].values())
+    print(f"{r['nivel']:>10g} {r['solicitudes_por_seg']:>8.1f} {r['sesiones_por_seg']:>7.2f} {latencias} "
+          f"{r['errores']:>8.2%} {r['descartadas']:>5}")
+
+def imprimir_sesiones(r):
+    for nombre, s in r["sesiones"].items():
+        print(f"{'':>10} {nombre:<14} {s['cantidad']:>6} sesiones  p50 {s['p50']:.1f} ms  p99 {s['p99']:.1f} ms")
+
+
+# ========== Ejecución ==========
+
+@asynccontextmanager
+async def cliente_externo(url, limite_conexiones):
+    limites = httpx.Limits(max_connections=limite_conexiones, max_keepalive_connections=limite_conexiones)
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limites) as cliente:
+        yield cliente, None
+
+async def correr_niveles(args):
+    niveles = args.usuarios if args.modelo == "cerrado" else args.tasas
+    conexiones = max(100, int(max(niveles)) * 4) if args.modelo == "cerrado" else args.max_en_curso * 4
+    abrir = (cliente_externo(args.url, conexiones) if args.url
+             else bench_api.cliente_http(workers=args.workers, limite_conexiones=conexiones))
+
+    resultados = []
+    async with abrir as (cliente, _):
+        # Restaurantes.tsx pide /restaurantes sin la barra final; axios sigue la redirección
+        cliente.follow_redirects = True
+        m = await muestras_api(cliente)
+        imprimir_encabezado(args.modelo)
+        for nivel in niveles:
+            if args.modelo == "cerrado":
+                carga = carga_cerrada(cliente, m, args.mezcla, nivel, args.duracion, args.pausa, args.semilla)
+            else:
+                carga = carga_abierta(cliente, m, args.mezcla, nivel, args.duracion, args.max_en_curso, args.semilla)
+            r = resumir(nivel, *await carga)
+            imprimir_nivel(r)
+            if args.detalle:
+                imprimir_sesiones(r)
+            resultados.append(r)
+    return resultados
+
+def correr(args):
+    if not args.url:
+        bench_api.preparar_entorno(args)
+        if not args.reusar:
+            bench_api.sembrar(args.escala, args.semilla, args.procesos)
+
+    niveles = asyncio.run(correr_niveles(args))
+    saturacion = punto_de_saturacion(niveles, args)
+    if saturacion is None:
+        print(f"\n⚠️ Ningún nivel cumple p99 ≤ {args.slo_p99_ms:g} ms con errores ≤ {args.max_errores:.1%}")
+    else:
+        unidad = "usuarios concurrentes" if args.modelo == "cerrado" else "sesiones/s"
+        print(f"\n🎯 Punto de saturación: {saturacion['nivel']:g} {unidad} "
+              f"({saturacion['solicitudes_por_seg']:.1f} sol/s, p99 {saturacion['latencia_ms']['p99']:.1f} ms)")
+
+    resultados = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "modelo": args.modelo,
+        "destino": args.url or f"uvicorn local ({args.workers} workers, escala {args.escala})",
+        "mezcla": args.mezcla,
+        "duracion": args.duracion,
+        "slo_p99_ms": args.slo_p99_ms,
+        "maquina": {"python": platform.python_version(), "sistema": platform.platform(), "cpus": os.cpu_count()},
+        "niveles": niveles,
+        "saturacion": saturacion["nivel"] if saturacion else None,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados en {args.salida}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga con la mezcla de tráfico del frontend")
+    bench_api.argumentos_comunes(parser)
+    parser.add_argument("--url", default=None, help="Despliegue a probar (sin --url se siembra y levanta uno local)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn del despliegue local")
+    parser.add_argument("--modelo", choices=["cerrado", "abierto"], default="cerrado")
+    parser.add_argument("--usuarios", type=leer_niveles, default=[1, 2, 4, 8, 16, 32], help="Usuarios concurrentes por nivel (cerrado)")
+    parser.add_argument("--tasas", type=leer_niveles, default=[1, 2, 5, 10, 20], help="Sesiones por segundo por nivel (abierto)")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos por nivel")
+    parser.add_argument("--pausa", type=float, default=0, help="Pausa media entre sesiones de un usuario, en segundos (cerrado)")
+    parser.add_argument("--max-en-curso", type=int, default=500, help="Sesiones simultáneas antes de descartar llegadas (abierto)")
+    parser.add_argument("--mezcla", type=leer_mezcla, default=leer_mezcla(MEZCLA_BASE), help="Peso de cada sesión")
+    parser.add_argument("--slo-p99-ms", type=float, default=1000)
+    parser.add_argument("--max-errores", type=float, default=0.01, help="Fracción de solicitudes con error permitida")
+    parser.add_argument("--crecimiento-minimo", type=float, default=0.05, help="Subida de throughput que justifica más usuarios")
+    parser.add_argument("--detalle", action="store_true", help="Imprime las latencias por tipo de sesión")
+    parser.add_argument("--salida", default="carga_resultados.json")
+    args = parser.parse_args()
+
+    if args.lanzar_mongod and not args.url:
+        with bench_api.mongod_temporal() as uri:
+            args.uri = uri
+            correr(args)
+    else:
+        correr(args)
+    sys.exit(0)
@@ -0,0 +1,271 @@
+# Registro de operaciones lentas de la API
+# - Comandos de Mongo que superan CONSULTAS_LENTAS_UMBRAL_MS: ruta que los originó, filtro o pipeline
+#   con los valores ocultos y el plan de explain("executionStats")
+# - Solicitudes HTTP que superan CONSULTAS_LENTAS_HTTP_UMBRAL_MS, con los comandos que ejecutaron
+# Las entradas se guardan en un buffer circular (CONSULTAS_LENTAS_MAX) y se consultan en
+# GET /diagnostico/consultas-lentas. Como explain vuelve a ejecutar la consulta, cada forma de
+# consulta se explica como mucho una vez cada CONSULTAS_LENTAS_EXPLAIN_CADA_SEG segundos.
+
+import os
+import time
+import asyncio
+import itertools
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from pymongo import monitoring
+from bson.json_util import dumps
+
+from indices import etapas_plan, estadisticas_ejecucion
+
+UMBRAL_MS = float(os.getenv("CONSULTAS_LENTAS_UMBRAL_MS", 100))
+UMBRAL_HTTP_MS = float(os.getenv("CONSULTAS_LENTAS_HTTP_UMBRAL_MS", 500))
+MAX_ENTRADAS = int(os.getenv("CONSULTAS_LENTAS_MAX", 200))
+EXPLICAR = os.getenv("CONSULTAS_LENTAS_EXPLAIN", "1") == "1"
+EXPLAIN_CADA_SEG = float(os.getenv("CONSULTAS_LENTAS_EXPLAIN_CADA_SEG", 60))
+
+# Comandos que se pueden explicar y los campos que describen la consulta
+CAMPOS_CONSULTA = {
+    "find": ("filter", "sort", "projection", "limit", "skip", "hint", "collation"),
+    "aggregate": ("pipeline", "hint", "collation"),
+    "count": ("query", "limit", "skip", "hint", "collation"),
+    "distinct": ("key", "query", "collation"),
+    "findAndModify": ("query", "sort", "update", "collation"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+
+# Claves cuyo valor describe la forma de la consulta (campos, orden, límites), no datos del usuario
+CLAVES_ESTRUCTURALES = {
+    "$sort", "sort", "$project", "projection", "$limit", "limit", "$skip", "skip", "hint", "key",
+    "collation", "$unwind", "from", "localField", "foreignField", "as", "into", "on", "unit",
+    "$meta", "distanceField", "spherical", "sortBy", "$count",
+}
+
+# Copia del comando con los valores reemplazados por "?"; se conservan los operadores,
+# los nombres de campo y las referencias a campos ("$total")
+def redactar(valor, clave=None):
+    if clave in CLAVES_ESTRUCTURALES:
+        return valor
+    if isinstance(valor, dict):
+        return {k: redactar(v, k) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [redactar(v) for v in valor]
+    if isinstance(valor, str) and valor.startswith("$"):
+        return valor
+    if valor is None or isinstance(valor, bool):
+        return valor
+    return "?"
+
+# Claves del explain que describen el plan y no los datos: nombres de etapas e índices, patrones
+# de llaves y contadores. Todo lo demás se redacta como la consulta.
+CLAVES_PLAN = {
+    "stage", "indexName", "namespace", "direction", "keyPattern", "sortPattern", "multiKeyPaths",
+    "isMultiKey", "isUnique", "isSparse", "isPartial", "indexVersion", "planCacheKey", "queryHash",
+    "planCacheShapeHash", "limitAmount", "skipAmount", "executionSuccess", "nReturned",
+    "executionTimeMillis", "executionTimeMillisEstimate", "totalKeysExamined", "totalDocsExamined",
+    "works", "advanced", "needTime", "needYield", "saveState", "restoreState", "isEOF",
+    "keysExamined", "docsExamined", "seeks", "dupsTested", "dupsDropped", "memUsage", "memLimit",
+    "totalDataSizeSorted", "usedDisk", "spills", "spilledBytes", "spilledRecords",
+}
+# Partes que se descartan: el plan de SBE es un texto con las constantes de la consulta
+CLAVES_PLAN_DESCARTADAS = {"slotBasedPlan"}
+
+# Copia del explain con todos los valores redactados menos los de CLAVES_PLAN y CLAVES_ESTRUCTURALES
+def redactar_plan(valor, clave=None):
+    if clave in CLAVES_PLAN or clave in CLAVES_ESTRUCTURALES:
+        return valor
+    if isinstance(valor, dict):
+        return {k: redactar_plan(v, k) for k, v in valor.items() if k not in CLAVES_PLAN_DESCARTADAS}
+    if isinstance(valor, (list, tuple)):
+        return [redactar_plan(v) for v in valor]
+    return redactar(valor)
+
+def consulta_de(comando, nombre):
+    return {campo: comando[campo] for campo in CAMPOS_CONSULTA[nombre] if campo in comando}
+
+# Busca alguna etapa del explain que haya tenido que escribir a disco (sort o group sin memoria)
+def uso_disco(nodo):
+    if isinstance(nodo, dict):
+        if nodo.get("usedDisk") or nodo.get("spills", 0) > 0:
+            return True
+        return any(uso_disco(v) for v in nodo.values())
+    if isinstance(nodo, list):
+        return any(uso_disco(v) for v in nodo)
+    return False
+
+def resumir_plan(plan):
+    stats = estadisticas_ejecucion(plan) or {}
+    etapas = etapas_plan(plan)
+    return {
+        "etapas": list(reversed(etapas)),
+        "collscan": "COLLSCAN" in etapas,
+        "uso_disco": uso_disco(plan),
+        "documentos_examinados": stats.get("totalDocsExamined"),
+        "llaves_examinadas": stats.get("totalKeysExamined"),
+        "devueltos": stats.get("nReturned"),
+        "tiempo_ms": stats.get("executionTimeMillis"),
+    }
+
+MAX_COMANDOS_SOLICITUD = 50
+
+# Solicitud HTTP en curso; el listener de comandos la usa para saber qué ruta originó cada comando
+solicitud_actual = ContextVar("solicitud_actual", default=None)
+
+def ruta_de(solicitud):
+    if solicitud is None:
+        return None
+    return getattr(solicitud["scope"].get("route"), "path", solicitud["scope"].get("path"))
+
+
+class RegistroLento:
+    def __init__(self, max_entradas=MAX_ENTRADAS):
+        self.entradas = deque(maxlen=max_entradas)
+        self.ids = itertools.count(1)
+        self.explicados = {}  # forma de la consulta → momento del último explain
+        self.explicador = None  # async (base, comando) → plan; lo configura la API
+        self.tareas = set()
+        self.lock = threading.Lock()
+
+    def agregar(self, entrada):
+        entrada["id"] = next(self.ids)
+        entrada["fecha"] = datetime.utcnow()
+        with self.lock:
+            self.entradas.append(entrada)
+        return entrada
+
+    def listar(self, tipo=None, ruta=None, limit=None):
+        with self.lock:
+            entradas = list(self.entradas)
+        entradas.reverse()
+        if tipo:
+            entradas = [e for e in entradas if e["tipo"] == tipo]
+        if ruta:
+            entradas = [e for e in entradas if e.get("ruta") == ruta]
+        return entradas[:limit] if limit else entradas
+
+    def vaciar(self):
+        with self.lock:
+            self.entradas.clear()
+            self.explicados.clear()
+
+    # Decide si vale la pena volver a ejecutar esta forma de consulta con explain
+    def debe_explicar(self, forma):
+        ahora = time.monotonic()
+        with self.lock:
+            if ahora - self.explicados.get(forma, -EXPLAIN_CADA_SEG) < EXPLAIN_CADA_SEG:
+                return False
+            self.explicados[forma] = ahora
+            if len(self.explicados) > 10 * self.entradas.maxlen:
+                self.explicados.clear()
+        return True
+
+    async def explicar(self, entrada, base, comando):
+        entrada["plan"] = {"estado": "pendiente"}
+        try:
+            plan = await self.explicador(base, comando)
+            entrada["plan"] = resumir_plan(plan)
+            entrada["explain"] = redactar_plan(plan)
+        except Exception as e:
+            entrada["plan"] = {"estado": "error", "detalle": str(e)}
+
+registro = RegistroLento()
+
+
+class ComandosLentos(monitoring.CommandListener):
+    def __init__(self, registro=registro, umbral_ms=UMBRAL_MS):
+        self.registro = registro
+        self.umbral_ms = umbral_ms
+        self.pendientes = {}  # (conexión, request_id) → (base, comando, solicitud)
+        self.lock = threading.Lock()
+
+    def started(self, evento):
+        solicitud = solicitud_actual.get()
+        if solicitud is not None:
+            # Se cuentan todos, pero solo se guardan los primeros nombres (un stream largo hace miles de getMore)
+            solicitud["total_comandos"] += 1
+            if len(solicitud["comandos"]) < MAX_COMANDOS_SOLICITUD:
+                solicitud["comandos"].append(evento.command_name)
+        if evento.command_name not in CAMPOS_CONSULTA and evento.command_name != "getMore":
+            return
+        with self.lock:
+            self.pendientes[(evento.connection_id, evento.request_id)] = (evento.database_name, evento.command, solicitud)
+
+    def terminar(self, evento):
+        with self.lock:
+            return self.pendientes.pop((evento.connection_id, evento.request_id), None)
+
+    def failed(self, evento):
+        self.terminar(evento)
+
+    def succeeded(self, evento):
+        pendiente = self.terminar(evento)
+        duracion_ms = evento.duration_micros / 1000
+        if pendiente is None or duracion_ms < self.umbral_ms:
+            return
+
+        base, comando, solicitud = pendiente
+        nombre = evento.command_name
+        coleccion = comando.get("collection") if nombre == "getMore" else comando.get(nombre)
+        entrada = {
+            "tipo": "comando",
+            "ruta": ruta_de(solicitud),
+            "comando": nombre,
+            "coleccion": coleccion,
+            "duracion_ms": round(duracion_ms, 2),
+            "consulta": redactar(consulta_de(comando, nombre)) if nombre in CAMPOS_CONSULTA else None,
+            "plan": None,
+        }
+        self.registro.agregar(entrada)
+
+        # getMore es la continuación de un cursor y no se puede explicar por sí solo
+        if not EXPLICAR or self.registro.explicador is None or nombre == "getMore":
+            return
+        if not self.registro.debe_explicar((coleccion, nombre, dumps(entrada["consulta"], sort_keys=True))):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        explicable = {nombre: coleccion, **consulta_de(comando, nombre)}
+        if nombre == "aggregate":
+            explicable["cursor"] = {}
+        # explain solo acepta una sentencia de update o delete; se usa la primera del lote
+        for campo in ("updates", "deletes"):
+            if campo in explicable:
+                explicable[campo] = explicable[campo][:1]
+        tarea = loop.create_task(self.registro.explicar(entrada, base, explicable))
+        # Se guarda una referencia para que la tarea no se recolecte antes de terminar
+        self.registro.tareas.add(tarea)
+        tarea.add_done_callback(self.registro.tareas.discard)
+
+
+# Middleware ASGI: deja la solicitud en el contexto y registra las que superan el umbral HTTP
+class MiddlewareConsultasLentas:
+    def __init__(self, app, registro=registro, umbral_ms=UMBRAL_HTTP_MS):
+        self.app = app
+        self.registro = registro
+        self.umbral_ms = umbral_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        solicitud = {"scope": scope, "comandos": [], "total_comandos": 0}
+        token = solicitud_actual.set(solicitud)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            solicitud_actual.reset(token)
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            if duracion_ms >= self.umbral_ms:
+                self.registro.agregar({
+                    "tipo": "solicitud",
+                    "ruta": ruta_de(solicitud),
+                    "metodo": scope["method"],
+                    "duracion_ms": round(duracion_ms, 2),
+                    "comandos_mongo": solicitud["total_comandos"],
+                    "comandos": solicitud["comandos"],
+                })
@@ -1,220 +1,442 @@
-import csv
-import random
+# Generador de datos sintéticos para la base del proyecto
+# - Escala configurable (--escala o un total por colección) y semilla fija: la misma semilla,
+#   los mismos totales y la misma --fecha-fin producen exactamente los mismos archivos
+# - Las columnas numéricas y categóricas (precios, cantidades, coordenadas, fechas, estado) se generan
+#   por bloques con NumPy; Faker solo llena un repertorio pequeño de textos por bloque
+# - Los bloques se reparten entre procesos y cada uno escribe su parte; al final se concatenan en orden
+# - Los temp_id se derivan del índice ("u42", "o1337"), así las referencias entre colecciones se
+#   generan sin guardar listas de IDs en memoria
+# - Formatos de salida (--formato):
+#   csv:    Data/<colección>.csv con temp_id, para mongoimport.py
+#   ndjson: Data/ndjson/<colección>_<bloque>.ndjson, documentos tipados en Extended JSON
+#   bson:   Data/bson/<colección>_<bloque>.bson, documentos tipados en BSON
+#   mongo:  reemplaza las colecciones en MONGO_URI e inserta los documentos por lotes, sin archivos intermedios
+#   Fuera de csv, los temp_id ya se escriben como el ObjectId determinista que usa mongoimport.py,
+#   así que los cuatro formatos generan la misma base
+# Uso: python dataFaker.py [--escala 1] [--ordenes N] [--semilla 42] [--procesos N] [--formato csv]
+
 import os
+import csv
+import shutil
+import argparse
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from faker import Faker
-from uuid import uuid4
-from datetime import datetime, timedelta
-
-fake = Faker("es_MX")
-
-os.makedirs("Data", exist_ok=True)
-
-# ========== Generadores de IDs ==========
-usuarios_ids = [str(uuid4()) for _ in range(10000)]
-restaurantes_ids = [str(uuid4()) for _ in range(100)]
-menu_items_ids = []
-ordenes_ids = []
-
-# ========== Usuarios ==========
-with open("Data/usuarios.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(
-        [
-            "temp_id",
-            "nombre",
-            "correo",
-            "telefono",
-            "direccion_nombre",
-            "longitud",
-            "latitud",
-            "municipio",
-            "fecha_registro",
-        ]
-    )
-    for temp_id in usuarios_ids:
-        ubicacion = [
-            round(random.uniform(-117.1, -86.7), 6),
-            round(random.uniform(14.5, 32.7), 6),
-        ]
-        writer.writerow(
-            [
-                temp_id,
-                fake.name(),
-                fake.unique.email(),
-                fake.phone_number(),
-                fake.street_name(),
-                ubicacion[0],
-                ubicacion[1],
-                fake.city(),
-                fake.date_between(start_date="-2y", end_date="today"),
-            ]
-        )
-
-# ========== Restaurantes ==========
-horarios_restaurantes = {}
-with open("Data/restaurantes.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(
-        [
-            "temp_id",
-            "nombre",
-            "longitud",
-            "latitud",
-            "departamento",
-            "ciudad",
-            "categoria",
-            "calificacion_promedio",
-            "horario",
-        ]
-    )
-    for temp_id in restaurantes_ids:
-        ubicacion = [
-            round(random.uniform(-117.1, -86.7), 6),
-            round(random.uniform(14.5, 32.7), 6),
-        ]
-        hora_apertura = random.randint(7, 10)
-        hora_cierre = random.randint(19, 23)
-        horario_str = f"{hora_apertura}:00-{hora_cierre}:00"
-        horarios_restaurantes[temp_id] = (hora_apertura, hora_cierre)
-        writer.writerow(
-            [
-                temp_id,
-                fake.company(),
-                ubicacion[0],
-                ubicacion[1],
-                fake.state(),
-                fake.city(),
-                random.choice(
-                    [
-                        "Mexicana",
-                        "Italiana",
-                        "Japonesa",
-                        "China",
-                        "Vegetariana",
-                        "Mariscos",
-                    ]
-                ),
-                round(random.uniform(1, 5), 1),
-                horario_str,
-            ]
-        )
-
-# ========== Menú ==========
-with open("Data/menu_items.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(
-        [
-            "temp_id",
-            "nombre",
-            "descripcion",
-            "ingredientes",
-            "precio",
-            "disponible",
-            "categoria",
-            "restaurante_id",
-        ]
+from bson import encode
+from bson.json_util import dumps
+from pymongo import MongoClient
+
+from mongoimport import MONGO_URI, DB_NAME, LOTE_IMPORTACION, id_determinista, insertar_lote, finalizar_importacion
+
+# Totales con --escala 1 (los del proyecto original)
+TOTALES_BASE = {
+    "usuarios": 10000,
+    "restaurantes": 100,
+    "menu_items": 1000,
+    "ordenes": 35000,
+    "resenas": 15000,
+}
+
+COLUMNAS = {
+    "usuarios": ["temp_id", "nombre", "correo", "telefono", "direccion_nombre", "longitud", "latitud", "municipio", "fecha_registro"],
+    "restaurantes": ["temp_id", "nombre", "longitud", "latitud", "departamento", "ciudad", "categoria", "horario"],
+    "menu_items": ["temp_id", "nombre", "descripcion", "ingredientes", "precio", "disponible", "categoria", "restaurante_id"],
+    "ordenes": ["temp_id", "usuario_id", "restaurante_id", "fecha", "estado", "items", "total"],
+    "resenas": ["temp_id", "reviewed_id", "type", "usuario_id", "comentario", "calificacion", "fecha"],
+}
+
+# Prefijo del temp_id de cada colección
+PREFIJOS = {"usuarios": "u", "restaurantes": "r", "menu_items": "m", "ordenes": "o", "resenas": "e"}
+
+CATEGORIAS_RESTAURANTE = ["Mexicana", "Italiana", "Japonesa", "China", "Vegetariana", "Mariscos"]
+CATEGORIAS_MENU = ["Entrada", "Plato fuerte", "Postre", "Bebida"]
+ESTADOS = ["Pendiente", "Preparando", "Entregado", "Cancelado"]
+MINUTOS = np.array([0, 15, 30, 45])
+
+# Rango de coordenadas (México)
+LONGITUD = (-117.1, -86.7)
+LATITUD = (14.5, 32.7)
+
+# Textos distintos que Faker genera por bloque; las filas los toman al azar
+REPERTORIO = 1000
+
+FILAS_POR_BLOQUE = 100000
+
+
+def temp_ids(coleccion, indices):
+    prefijo = PREFIJOS[coleccion]
+    return [f"{prefijo}{i}" for i in indices.tolist()]
+
+# Generador de NumPy propio de cada (colección, bloque), para que el resultado no dependa
+# de cuántos procesos se usen ni de en qué orden terminen
+def generador(semilla, coleccion, bloque):
+    return np.random.default_rng([semilla, list(COLUMNAS).index(coleccion), bloque])
+
+def faker_de(semilla, coleccion, bloque):
+    fake = Faker("es_MX")
+    fake.seed_instance(semilla * 1_000_003 + list(COLUMNAS).index(coleccion) * 10_007 + bloque)
+    return fake
+
+def elegir(rng, opciones, n):
+    return np.asarray(opciones, dtype=object)[rng.integers(0, len(opciones), n)]
+
+def repertorio(fake, metodo, n, **kwargs):
+    return [getattr(fake, metodo)(**kwargs) for _ in range(min(n, REPERTORIO))]
+
+# Fechas (datetime) dentro de los `dias` anteriores a fecha_fin, con hora y minuto dados
+def fechas(rng, fecha_fin, dias, n, horas=None, minutos=None):
+    fin = np.datetime64(fecha_fin, "D")
+    valores = (fin - rng.integers(0, dias, n)).astype("datetime64[s]")
+    if horas is not None:
+        valores = valores + horas.astype("timedelta64[h]") + minutos.astype("timedelta64[m]")
+    return valores.tolist()
+
+def coordenadas(rng, n):
+    return (
+        np.round(rng.uniform(*LONGITUD, n), 6).tolist(),
+        np.round(rng.uniform(*LATITUD, n), 6).tolist(),
     )
-    for _ in range(1000):
-        temp_id = str(uuid4())
-        menu_items_ids.append(temp_id)
-        writer.writerow(
-            [
-                temp_id,
-                fake.word().capitalize(),
-                fake.sentence(),
-                ", ".join(fake.words(nb=random.randint(2, 5))),
-                round(random.uniform(50, 300), 2),
-                random.randint(0,150),
-                random.choice(["Entrada", "Plato fuerte", "Postre", "Bebida"]),
-                random.choice(restaurantes_ids),
-            ]
-        )
-
-# ========== Órdenes ==========
-with open("Data/ordenes.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(
-        ["temp_id", "usuario_id", "restaurante_id", "fecha", "estado", "items", "total"]
+
+# Datos compartidos por todos los bloques, derivados solo de la semilla: horario de cada restaurante
+# y precio de cada item del menú (las órdenes cobran el precio del menú)
+def horarios_restaurantes(semilla, total):
+    rng = np.random.default_rng([semilla, 100])
+    return rng.integers(7, 11, total), rng.integers(19, 24, total)
+
+def precios_menu(semilla, total):
+    rng = np.random.default_rng([semilla, 101])
+    return np.round(rng.uniform(50, 300, total), 2)
+
+# Cada item del menú i pertenece al restaurante i % restaurantes; estos son cuántos tiene cada uno
+def items_por_restaurante(totales):
+    restaurantes = np.arange(totales["restaurantes"])
+    return (totales["menu_items"] - restaurantes + totales["restaurantes"] - 1) // totales["restaurantes"]
+
+
+# ========== Generadores por colección ==========
+# Reciben el rango [inicio, inicio + n) y devuelven las columnas, ya tipadas, en el orden de COLUMNAS.
+# Los items de una orden son tuplas (temp_id del item, cantidad, precio unitario, descuento)
+
+def generar_usuarios(rng, fake, inicio, n, totales, params):
+    indices = np.arange(inicio, inicio + n)
+    nombres = elegir(rng, repertorio(fake, "name", n), n)
+    usuarios = elegir(rng, repertorio(fake, "user_name", n), n)
+    dominios = elegir(rng, repertorio(fake, "free_email_domain", n), n)
+    # El índice en el correo lo hace único sin llevar un registro de los ya usados
+    correos = [f"{usuario}.{i}@{dominio}"
+               for usuario, i, dominio in zip(usuarios.tolist(), indices.tolist(), dominios.tolist())]
+    telefonos = [f"+52 {numero // 10**7:03d} {numero // 10**4 % 1000:03d} {numero % 10**4:04d}"
+                 for numero in rng.integers(2 * 10**9, 10**10, n).tolist()]
+    longitudes, latitudes = coordenadas(rng, n)
+    return [
+        temp_ids("usuarios", indices),
+        nombres.tolist(),
+        correos,
+        telefonos,
+        elegir(rng, repertorio(fake, "street_name", n), n).tolist(),
+        longitudes,
+        latitudes,
+        elegir(rng, repertorio(fake, "city", n), n).tolist(),
+        fechas(rng, params["fecha_fin"], 730, n),
+    ]
+
+def generar_restaurantes(rng, fake, inicio, n, totales, params):
+    indices = np.arange(inicio, inicio + n)
+    apertura, cierre = horarios_restaurantes(params["semilla"], totales["restaurantes"])
+    longitudes, latitudes = coordenadas(rng, n)
+    return [
+        temp_ids("restaurantes", indices),
+        elegir(rng, repertorio(fake, "company", n), n).tolist(),
+        longitudes,
+        latitudes,
+        elegir(rng, repertorio(fake, "state", n), n).tolist(),
+        elegir(rng, repertorio(fake, "city", n), n).tolist(),
+        elegir(rng, CATEGORIAS_RESTAURANTE, n).tolist(),
+        [f"{a}:00-{c}:00" for a, c in zip(apertura[indices].tolist(), cierre[indices].tolist())],
+    ]
+
+def generar_menu_items(rng, fake, inicio, n, totales, params):
+    indices = np.arange(inicio, inicio + n)
+    palabras = repertorio(fake, "word", n * 4)
+    cantidades = rng.integers(2, 6, n)
+    ingredientes = elegir(rng, palabras, int(cantidades.sum())).tolist()
+    cortes = np.concatenate([[0], np.cumsum(cantidades)]).tolist()
+    return [
+        temp_ids("menu_items", indices),
+        [p.capitalize() for p in elegir(rng, palabras, n).tolist()],
+        elegir(rng, repertorio(fake, "sentence", n), n).tolist(),
+        [", ".join(ingredientes[a:b]) for a, b in zip(cortes, cortes[1:])],
+        precios_menu(params["semilla"], totales["menu_items"])[indices].tolist(),
+        rng.integers(0, 151, n).tolist(),
+        elegir(rng, CATEGORIAS_MENU, n).tolist(),
+        temp_ids("restaurantes", indices % totales["restaurantes"]),
+    ]
+
+def generar_ordenes(rng, fake, inicio, n, totales, params):
+    indices = np.arange(inicio, inicio + n)
+    restaurantes = rng.integers(0, totales["restaurantes"], n)
+    apertura, cierre = horarios_restaurantes(params["semilla"], totales["restaurantes"])
+    horas = apertura[restaurantes] + (rng.random(n) * (cierre - apertura)[restaurantes]).astype(np.int64)
+    minutos = MINUTOS[rng.integers(0, len(MINUTOS), n)]
+
+    # Entre 1 y 5 items por orden, todos del menú del restaurante de la orden
+    cantidad_items = rng.integers(1, 6, n)
+    orden_de_item = np.repeat(np.arange(n), cantidad_items)
+    restaurante_de_item = restaurantes[orden_de_item]
+    disponibles = items_por_restaurante(totales)[restaurante_de_item]
+    items = restaurante_de_item + totales["restaurantes"] * (rng.random(len(orden_de_item)) * disponibles).astype(np.int64)
+    cantidades = rng.integers(1, 4, len(items))
+    precios = precios_menu(params["semilla"], totales["menu_items"])[items]
+    descuentos = np.round(rng.uniform(0, 0.3, len(items)), 2)
+    totales_orden = np.round(np.bincount(orden_de_item, weights=cantidades * precios * (1 - descuentos), minlength=n), 2)
+
+    detalle = list(zip(temp_ids("menu_items", items), cantidades.tolist(), precios.tolist(), descuentos.tolist()))
+    cortes = np.concatenate([[0], np.cumsum(cantidad_items)]).tolist()
+    return [
+        temp_ids("ordenes", indices),
+        temp_ids("usuarios", rng.integers(0, totales["usuarios"], n)),
+        temp_ids("restaurantes", restaurantes),
+        fechas(rng, params["fecha_fin"], 365, n, horas, minutos),
+        elegir(rng, ESTADOS, n).tolist(),
+        [detalle[a:b] for a, b in zip(cortes, cortes[1:])],
+        totales_orden.tolist(),
+    ]
+
+def generar_resenas(rng, fake, inicio, n, totales, params):
+    indices = np.arange(inicio, inicio + n)
+    de_orden = rng.random(n) < 0.5
+    reseñados = np.where(
+        de_orden,
+        rng.integers(0, totales["ordenes"], n),
+        rng.integers(0, totales["restaurantes"], n)
     )
-    for _ in range(35000):
-        temp_id = str(uuid4())
-        ordenes_ids.append(temp_id)
-        usuario_id = random.choice(usuarios_ids)
-        restaurante_id = random.choice(restaurantes_ids)
-        fecha_base = fake.date_between(start_date="-1y", end_date="today")
-        hora_apertura, hora_cierre = horarios_restaurantes[restaurante_id]
-        hora_random = random.randint(hora_apertura, hora_cierre - 1)
-        minuto_random = random.choice([0, 15, 30, 45])
-        fecha = datetime.combine(fecha_base, datetime.min.time()) + timedelta(hours=hora_random, minutes=minuto_random)
-        estado = random.choice(["Pendiente", "Preparando", "Entregado", "Cancelado"])
-
-        # Generar entre 1 y 5 items por orden
-        items = []
-        total = 0
-        for _ in range(random.randint(1, 5)):
-            item_id = random.choice(menu_items_ids)
-            cantidad = random.randint(1, 3)
-            precio_unitario = round(random.uniform(50, 300), 2)
-            descuento = round(random.uniform(0, 0.3), 2)
-            subtotal = cantidad * precio_unitario * (1 - descuento)
-            total += subtotal
-            items.append(f"{item_id}:{cantidad}:{precio_unitario}:{descuento}")
-
-        writer.writerow(
-            [
-                temp_id,
-                usuario_id,
-                restaurante_id,
-                fecha.strftime("%Y-%m-%d %H:%M:%S"),
-                estado,
-                "|".join(items),
-                round(total, 2),
-            ]
-        )
-
-# ========== Reseñas ==========
-with open("Data/resenas.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(
-        [
-            "temp_id",
-            "reviewed_id",
-            "type",
-            "usuario_id",
-            "comentario",
-            "calificacion",
-            "fecha",
+    reviewed_ids = [f"o{i}" if orden else f"r{i}" for i, orden in zip(reseñados.tolist(), de_orden.tolist())]
+    return [
+        temp_ids("resenas", indices),
+        reviewed_ids,
+        np.where(de_orden, "orden", "restaurante").tolist(),
+        temp_ids("usuarios", rng.integers(0, totales["usuarios"], n)),
+        elegir(rng, repertorio(fake, "sentence", n), n).tolist(),
+        rng.integers(1, 6, n).tolist(),
+        fechas(rng, params["fecha_fin"], 365, n, rng.integers(0, 24, n), MINUTOS[rng.integers(0, len(MINUTOS), n)]),
+    ]
+
+GENERADORES = {
+    "usuarios": generar_usuarios,
+    "restaurantes": generar_restaurantes,
+    "menu_items": generar_menu_items,
+    "ordenes": generar_ordenes,
+    "resenas": generar_resenas,
+}
+
+
+# ========== Documentos tipados ==========
+# Misma forma que los constructores de mongoimport.py, sin pasar por texto
+
+def oids(valores):
+    return [id_determinista(v) for v in valores]
+
+def documentos_usuarios(c):
+    return [
+        {
+            "_id": _id, "nombre": nombre, "correo": correo, "telefono": telefono,
+            "direccion": {
+                "nombre": direccion, "municipio": municipio,
+                "ubicacion": {"latitud": latitud, "longitud": longitud},
+            },
+            "fecha_registro": fecha,
+        }
+        for _id, nombre, correo, telefono, direccion, longitud, latitud, municipio, fecha
+        in zip(oids(c[0]), *c[1:])
+    ]
+
+def documentos_restaurantes(c):
+    return [
+        {
+            "_id": _id, "nombre": nombre,
+            "ubicacion": {"latitud": latitud, "longitud": longitud},
+            "ubicacion_geo": {"type": "Point", "coordinates": [longitud, latitud]},
+            "departamento": departamento, "ciudad": ciudad, "categoria": categoria, "horario": horario,
+        }
+        for _id, nombre, longitud, latitud, departamento, ciudad, categoria, horario
+        in zip(oids(c[0]), *c[1:])
+    ]
+
+def documentos_menu_items(c):
+    return [
+        {
+            "_id": _id, "nombre": nombre, "descripcion": descripcion,
+            "ingredientes": ingredientes.split(", "), "precio": precio, "disponible": disponible,
+            "categoria": categoria, "restaurante_id": restaurante_id,
+        }
+        for _id, nombre, descripcion, ingredientes, precio, disponible, categoria, restaurante_id
+        in zip(oids(c[0]), c[1], c[2], c[3], c[4], c[5], c[6], oids(c[7]))
+    ]
+
+def documentos_ordenes(c):
+    return [
+        {
+            "_id": _id, "usuario_id": usuario_id, "restaurante_id": restaurante_id,
+            "fecha": fecha, "estado": estado,
+            "items": [
+                {"item_id": id_determinista(item), "cantidad": cantidad, "precio_unitario": precio, "descuento": descuento}
+                for item, cantidad, precio, descuento in items
+            ],
+            "total": total,
+        }
+        for _id, usuario_id, restaurante_id, fecha, estado, items, total
+        in zip(oids(c[0]), oids(c[1]), oids(c[2]), c[3], c[4], c[5], c[6])
+    ]
+
+def documentos_resenas(c):
+    return [
+        {
+            "_id": _id, "reviewed_id": reviewed_id, "type": tipo, "usuario_id": usuario_id,
+            "comentario": comentario, "calificacion": calificacion, "fecha": fecha,
+        }
+        for _id, reviewed_id, tipo, usuario_id, comentario, calificacion, fecha
+        in zip(oids(c[0]), oids(c[1]), c[2], oids(c[3]), c[4], c[5], c[6])
+    ]
+
+DOCUMENTOS = {
+    "usuarios": documentos_usuarios,
+    "restaurantes": documentos_restaurantes,
+    "menu_items": documentos_menu_items,
+    "ordenes": documentos_ordenes,
+    "resenas": documentos_resenas,
+}
+
+
+# ========== Salida ==========
+
+def ruta_parte(salida, coleccion, bloque, formato="csv"):
+    carpeta = "partes" if formato == "csv" else formato
+    return os.path.join(salida, carpeta, f"{coleccion}_{bloque:06d}.{formato}")
+
+def escribir_csv(ruta, coleccion, columnas):
+    if coleccion == "ordenes":
+        columnas = list(columnas)
+        columnas[5] = ["|".join(f"{i}:{c}:{p}:{d}" for i, c, p, d in items) for items in columnas[5]]
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(zip(*columnas))
+
+def escribir_ndjson(ruta, documentos):
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.writelines(dumps(doc, ensure_ascii=False) + "\n" for doc in documentos)
+
+def escribir_bson(ruta, documentos):
+    with open(ruta, "wb") as f:
+        f.writelines(encode(doc) for doc in documentos)
+
+# Un cliente por proceso del pool: se crea con el primer bloque y lo reutilizan los siguientes
+CLIENTE_MONGO = None
+
+def base_mongo():
+    global CLIENTE_MONGO
+    if CLIENTE_MONGO is None:
+        CLIENTE_MONGO = MongoClient(MONGO_URI)
+    return CLIENTE_MONGO[DB_NAME]
+
+def insertar_en_mongo(coleccion, documentos):
+    db = base_mongo()
+    for inicio in range(0, len(documentos), LOTE_IMPORTACION):
+        insertar_lote(db, coleccion, documentos[inicio:inicio + LOTE_IMPORTACION])
+
+# Genera un bloque de filas de una colección y lo escribe en el formato pedido
+# (en csv, como parte sin encabezado que después se une con las demás)
+def generar_bloque(coleccion, bloque, totales, params):
+    inicio = bloque * params["filas_por_bloque"]
+    n = min(params["filas_por_bloque"], totales[coleccion] - inicio)
+    rng = generador(params["semilla"], coleccion, bloque)
+    fake = faker_de(params["semilla"], coleccion, bloque)
+    columnas = GENERADORES[coleccion](rng, fake, inicio, n, totales, params)
+
+    formato = params["formato"]
+    ruta = ruta_parte(params["salida"], coleccion, bloque, formato)
+    if formato == "csv":
+        escribir_csv(ruta, coleccion, columnas)
+        return n
+
+    documentos = DOCUMENTOS[coleccion](columnas)
+    if formato == "ndjson":
+        escribir_ndjson(ruta, documentos)
+    elif formato == "bson":
+        escribir_bson(ruta, documentos)
+    else:
+        insertar_en_mongo(coleccion, documentos)
+    return n
+
+# Une las partes de cada colección, en orden de bloque, en un solo CSV con encabezado
+def unir_partes(salida, coleccion, bloques):
+    with open(os.path.join(salida, f"{coleccion}.csv"), "w", newline="", encoding="utf-8") as destino:
+        csv.writer(destino).writerow(COLUMNAS[coleccion])
+        for bloque in range(bloques):
+            ruta = ruta_parte(salida, coleccion, bloque)
+            with open(ruta, encoding="utf-8") as parte:
+                shutil.copyfileobj(parte, destino, 1024 * 1024)
+            os.remove(ruta)
+
+def generar(totales, params, procesos=None):
+    formato = params["formato"]
+    if formato == "mongo":
+        # Los IDs dependen solo del temp_id: los datos de otra semilla chocarían con los nuevos
+        with MongoClient(MONGO_URI) as client:
+            for coleccion in COLUMNAS:
+                client[DB_NAME].drop_collection(coleccion)
+    else:
+        os.makedirs(os.path.join(params["salida"], "partes" if formato == "csv" else formato), exist_ok=True)
+    bloques = {c: -(-total // params["filas_por_bloque"]) for c, total in totales.items()}
+
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        futuros = [
+            executor.submit(generar_bloque, coleccion, bloque, totales, params)
+            for coleccion in COLUMNAS
+            for bloque in range(bloques[coleccion])
         ]
-    )
-    for _ in range(15000):
-        temp_id = str(uuid4())
-        tipo_objetivo = random.choice(["orden", "restaurante"])
-        if tipo_objetivo == "orden":
-            reviewed_id = random.choice(ordenes_ids)
-        else:
-            reviewed_id = random.choice(restaurantes_ids)
-        usuario_id = random.choice(usuarios_ids)
-        comentario = fake.sentence()
-        calificacion = random.randint(1, 5)
-        fecha_base = fake.date_between(start_date="-1y", end_date="today")
-        hora_random = random.randint(0, 23)
-        minuto_random = random.choice([0, 15, 30, 45])
-        fecha = datetime.combine(fecha_base, datetime.min.time()) + timedelta(hours=hora_random, minutes=minuto_random)
-        writer.writerow(
-            [
-                temp_id,
-                reviewed_id,
-                tipo_objetivo,
-                usuario_id,
-                comentario,
-                calificacion,
-                fecha.strftime("%Y-%m-%d %H:%M:%S"),
-            ]
-        )
-
-print("✅ Archivos CSV generados con éxito:")
-print("- usuarios.csv")
-print("- restaurantes.csv")
-print("- menu_items.csv")
-print("- ordenes.csv")
-print("- resenas.csv")
+        for futuro in futuros:
+            futuro.result()
+
+    for coleccion in COLUMNAS:
+        if formato == "csv":
+            unir_partes(params["salida"], coleccion, bloques[coleccion])
+        print(f"- {coleccion}: {totales[coleccion]} documentos en {bloques[coleccion]} bloques")
+    if formato == "csv":
+        os.rmdir(os.path.join(params["salida"], "partes"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los datos sintéticos de la base")
+    parser.add_argument("--escala", type=float, default=1, help="Multiplica los totales base de todas las colecciones")
+    for coleccion in TOTALES_BASE:
+        parser.add_argument(f"--{coleccion.replace('_', '-')}", type=int, dest=coleccion, help=f"Total de {coleccion} (ignora --escala)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--fecha-fin", type=date.fromisoformat, default=date(2025, 6, 1), help="Fecha más reciente de órdenes y reseñas")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument("--filas-por-bloque", type=int, default=FILAS_POR_BLOQUE)
+    parser.add_argument("--salida", default="Data")
+    parser.add_argument("--formato", choices=["csv", "ndjson", "bson", "mongo"], default="csv")
+    args = parser.parse_args()
+
+    totales = {
+        coleccion: getattr(args, coleccion) or max(1, round(base * args.escala))
+        for coleccion, base in TOTALES_BASE.items()
+    }
+    if totales["menu_items"] < totales["restaurantes"]:
+        parser.error("Se necesita al menos un item del menú por restaurante")
+    params = {
+        "semilla": args.semilla,
+        "fecha_fin": args.fecha_fin.isoformat(),
+        "filas_por_bloque": args.filas_por_bloque,
+        "salida": args.salida,
+        "formato": args.formato,
+    }
+
+    generar(totales, params, args.procesos)
+    if args.formato == "mongo":
+        # Índices, contadores de calificación, acumulados de ventas y reportes, igual que tras mongoimport.py
+        finalizar_importacion()
+        print(f"✅ Datos insertados en {DB_NAME}")
+    else:
+        print(f"✅ Archivos {args.formato} generados con éxito en {args.salida}")
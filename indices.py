@@ -0,0 +1,246 @@
+# Administrador declarativo de índices
+# Cada índice está ligado a las rutas de API.py cuya consulta atiende. El comando "sincronizar"
+# crea, reconstruye o elimina índices en DB_NAME hasta que coincidan con la especificación, y
+# "verificar" corre explain() sobre una consulta representativa de cada ruta y marca los COLLSCAN
+# o los planes que examinan muchos más documentos de los que devuelven.
+# Uso: python indices.py sincronizar | verificar [--umbral 10]
+
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+from pymongo import MongoClient, TEXT, ASCENDING, DESCENDING, GEOSPHERE
+
+# Cargar variables de entorno
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME", "proyecto2-db")
+
+# Colación sin distinguir mayúsculas; API.py la importa para que las consultas usen estos índices
+COLACION_CI = {"locale": "es", "strength": 2}
+
+def indice(nombre, claves, rutas, **opciones):
+    return {"nombre": nombre, "claves": claves, "rutas": rutas, "opciones": opciones}
+
+# Especificación de índices por colección y las rutas que los usan
+INDICES = {
+    "usuarios": [
+        indice("idx_correo", [("correo", ASCENDING)], ["GET /usuario/{correo}", "PUT /actualizarUsuario/{correo}"], collation=COLACION_CI),
+        indice("idx_municipio", [("direccion.municipio", ASCENDING)], ["DELETE /usuarios/municipio/{municipio}"]),
+        indice("idx_nombre_fecha", [("nombre", ASCENDING), ("fecha_registro", DESCENDING)], []),
+    ],
+    "restaurantes": [
+        indice("idx_nombre", [("nombre", ASCENDING)], ["GET /restaurante/{nombre}"], collation=COLACION_CI),
+        indice("idx_categoria", [("categoria", ASCENDING)], ["GET /restaurantes/filtro"], collation=COLACION_CI),
+        indice("idx_ciudad_categoria", [("ciudad", ASCENDING), ("categoria", ASCENDING)], ["GET /restaurantes/filtro"], collation=COLACION_CI),
+        indice("idx_texto_nombre_ciudad", [("nombre", TEXT), ("ciudad", TEXT)], ["GET /buscar/restaurantes"], default_language="spanish"),
+        indice("idx_resenas_calificacion", [("resenas_total", ASCENDING), ("calificacion_promedio", DESCENDING)], ["GET /reportes/calificaciones_promedio_restaurantes"]),
+        indice("idx_geo_pos", [("ubicacion_geo", GEOSPHERE), ("categoria", ASCENDING)], ["GET /restaurantes/cercanos", "GET /restaurantes/radio"]),
+    ],
+    "menu_items": [
+        indice("idx_nombre", [("nombre", ASCENDING)], ["GET /menu/{nombre}", "PUT /menu/ingredientes/{nombre_item}"], collation=COLACION_CI),
+        indice("idx_disponible", [("disponible", ASCENDING)], []),
+        indice("idx_rest_categoria", [("restaurante_id", ASCENDING), ("categoria", ASCENDING)], []),
+        indice("idx_texto_nombre_descripcion", [("nombre", TEXT), ("descripcion", TEXT)], ["GET /buscar/menu"],
+               weights={"nombre": 5, "descripcion": 1}, default_language="spanish"),
+    ],
+    "ordenes": [
+        # _id, estado y total van en el índice para que el resumen del historial sea una consulta cubierta
+        indice("idx_usuario_fecha", [("usuario_id", ASCENDING), ("fecha", DESCENDING), ("_id", DESCENDING), ("estado", ASCENDING), ("total", ASCENDING)],
+               ["GET /usuarios/{usuario_id}/ordenes"]),
+        # Igualdad por estado y rango/orden por total; el prefijo (estado) atiende los filtros por estado
+        indice("idx_estado_total", [("estado", ASCENDING), ("total", DESCENDING), ("_id", DESCENDING)],
+               ["GET /ordenes/mayores"]),
+        indice("idx_items_multikey", [("items.item_id", ASCENDING)], []),
+        indice("idx_actualizado", [("actualizado", ASCENDING)], ["POST /reportes/refrescar"]),
+    ],
+    "resenas": [
+        indice("idx_usuario", [("usuario_id", ASCENDING)], []),
+        # El $lookup de la reconciliación busca las reseñas de cada restaurante por reviewed_id
+        indice("idx_restaurante", [("reviewed_id", ASCENDING)], ["POST /reportes/calificaciones/reconciliar"]),
+        indice("idx_calif_fecha", [("calificacion", DESCENDING), ("fecha", DESCENDING)], []),
+        indice("idx_calif_id", [("calificacion", DESCENDING), ("_id", DESCENDING)], ["GET /reseñas/ordenadas"]),
+    ],
+    "ventas_diarias": [
+        # Único: los $inc con upsert de la API necesitan un solo documento por acumulado
+        indice("idx_ventas_clave", [("restaurante_id", ASCENDING), ("estado", ASCENDING), ("dia", ASCENDING), ("item_id", ASCENDING)],
+               ["GET /reportes/ventas/platos", "GET /reportes/ventas/diarias", "POST /reportes/refrescar"], unique=True),
+        indice("idx_ventas_estado_dia", [("estado", ASCENDING), ("dia", ASCENDING)],
+               ["GET /reportes/ventas/platos", "GET /reportes/ventas/restaurantes", "GET /reportes/ventas/diarias", "POST /reportes/refrescar"]),
+    ],
+}
+
+# Consulta representativa de cada ruta; "muestra" es un documento real de la colección
+# para que los valores del filtro existan y el plan sea el que vería la API.
+# "cubierta" marca las consultas que deben responderse solo con el índice (sin FETCH)
+CONSULTAS = [
+    {"ruta": "GET /usuario/{correo}", "coleccion": "usuarios",
+     "filtro": lambda m: {"correo": m["correo"].upper()}, "collation": COLACION_CI, "limit": 1},
+    {"ruta": "DELETE /usuarios/municipio/{municipio}", "coleccion": "usuarios",
+     "filtro": lambda m: {"direccion.municipio": m["direccion"]["municipio"]}},
+    {"ruta": "GET /usuarios?page_size", "coleccion": "usuarios",
+     "filtro": lambda m: {}, "sort": {"_id": 1}, "limit": 100},
+    {"ruta": "GET /restaurante/{nombre}", "coleccion": "restaurantes",
+     "filtro": lambda m: {"nombre": m["nombre"].lower()}, "collation": COLACION_CI, "limit": 1},
+    {"ruta": "GET /restaurante/id/{restaurante_id}", "coleccion": "restaurantes",
+     "filtro": lambda m: {"_id": m["_id"]}, "limit": 1},
+    {"ruta": "GET /restaurantes/filtro", "coleccion": "restaurantes",
+     "filtro": lambda m: {"ciudad": m["ciudad"], "categoria": m["categoria"]}, "collation": COLACION_CI},
+    {"ruta": "GET /buscar/restaurantes", "coleccion": "restaurantes",
+     "pipeline": lambda m: [{"$match": {"$text": {"$search": m["ciudad"]}}}, {"$sort": {"score": {"$meta": "textScore"}}}, {"$limit": 100}]},
+    {"ruta": "GET /restaurantes/cercanos", "coleccion": "restaurantes",
+     "pipeline": lambda m: [{"$geoNear": {"near": m["ubicacion_geo"], "distanceField": "distancia_m", "spherical": True,
+                                          "query": {"categoria": m["categoria"].lower()}}}, {"$limit": 10}],
+     "collation": COLACION_CI},
+    {"ruta": "GET /menu/{nombre}", "coleccion": "menu_items",
+     "filtro": lambda m: {"nombre": m["nombre"]}, "collation": COLACION_CI, "limit": 1},
+    {"ruta": "GET /buscar/menu", "coleccion": "menu_items",
+     "pipeline": lambda m: [{"$match": {"$text": {"$search": m["nombre"]}}}, {"$sort": {"score": {"$meta": "textScore"}}}, {"$limit": 100}]},
+    {"ruta": "GET /orden/{orden_id}", "coleccion": "ordenes",
+     "filtro": lambda m: {"_id": m["_id"]}, "limit": 1},
+    {"ruta": "GET /usuarios/{usuario_id}/ordenes", "coleccion": "ordenes",
+     "filtro": lambda m: {"usuario_id": m["usuario_id"], "fecha": {"$lte": m["fecha"]}}, "sort": {"fecha": -1, "_id": -1}, "limit": 101},
+    {"ruta": "GET /usuarios/{usuario_id}/ordenes?resumen", "coleccion": "ordenes",
+     "filtro": lambda m: {"usuario_id": m["usuario_id"], "fecha": {"$lte": m["fecha"]}}, "sort": {"fecha": -1, "_id": -1}, "limit": 101,
+     "projection": {"_id": 1, "fecha": 1, "estado": 1, "total": 1}, "cubierta": True},
+    {"ruta": "GET /ordenes/mayores", "coleccion": "ordenes",
+     "filtro": lambda m: {"estado": {"$in": ["Entregado", "Pendiente", "Preparando"]}, "total": {"$gt": 1000}},
+     "sort": {"total": -1, "_id": -1}, "limit": 100},
+    {"ruta": "GET /reseñas/ordenadas?page_size", "coleccion": "resenas",
+     "filtro": lambda m: {}, "sort": {"calificacion": -1, "_id": -1}, "limit": 100},
+    {"ruta": "GET /reportes/calificaciones_promedio_restaurantes", "coleccion": "restaurantes",
+     "filtro": lambda m: {"resenas_total": {"$gt": 10}}, "sort": {"calificacion_promedio": -1}},
+    {"ruta": "GET /reportes/ventas/platos?restaurante_id", "coleccion": "ventas_diarias",
+     "filtro": lambda m: {"restaurante_id": m["restaurante_id"], "estado": m["estado"], "dia": {"$gte": m["dia"]}}},
+    {"ruta": "GET /reportes/ventas/restaurantes", "coleccion": "ventas_diarias",
+     "filtro": lambda m: {"estado": m["estado"], "dia": {"$gte": m["dia"], "$lte": m["dia"]}}},
+    {"ruta": "GET /reportes/platos_mas_vendidos (refresco)", "coleccion": "ventas_diarias",
+     "filtro": lambda m: {"estado": "Entregado", "restaurante_id": {"$in": [m["restaurante_id"]]}}},
+]
+
+# Compara un índice de la especificación con el que existe en Mongo
+def coincide(especificado, existente):
+    opciones = especificado["opciones"]
+    if any(direccion == TEXT for _, direccion in especificado["claves"]):
+        campos = {campo for campo, _ in especificado["claves"]}
+        if set(existente.get("weights", {})) != campos:
+            return False
+    elif list(existente["key"]) != [(campo, direccion) for campo, direccion in especificado["claves"]]:
+        return False
+
+    for opcion, valor in opciones.items():
+        actual = existente.get(opcion)
+        if isinstance(valor, dict):
+            if not isinstance(actual, dict) or any(actual.get(k) != v for k, v in valor.items()):
+                return False
+        elif actual != valor:
+            return False
+    return True
+
+# Crea, reconstruye o elimina índices hasta que la base coincida con INDICES (idempotente)
+def sincronizar_indices(db):
+    print(f"🔧 Sincronizando índices en {db.name}...")
+    for coleccion, especificados in INDICES.items():
+        existentes = db[coleccion].index_information()
+        nombres = {e["nombre"] for e in especificados}
+
+        for nombre in existentes:
+            if nombre != "_id_" and nombre not in nombres:
+                db[coleccion].drop_index(nombre)
+                print(f"🗑️ {coleccion}.{nombre} eliminado (no está en la especificación)")
+
+        for especificado in especificados:
+            nombre = especificado["nombre"]
+            if nombre in existentes:
+                if coincide(especificado, existentes[nombre]):
+                    continue
+                db[coleccion].drop_index(nombre)
+                print(f"♻️ {coleccion}.{nombre} cambió, se reconstruye")
+            db[coleccion].create_index(especificado["claves"], name=nombre, **especificado["opciones"])
+            print(f"✅ {coleccion}.{nombre} creado")
+    print("✅ Índices sincronizados.")
+
+# Recorre el explain y junta las etapas del plan ganador
+def etapas_plan(nodo, dentro_del_ganador=False):
+    etapas = []
+    if isinstance(nodo, dict):
+        if dentro_del_ganador and "stage" in nodo:
+            etapas.append(nodo["stage"])
+        for clave, valor in nodo.items():
+            etapas += etapas_plan(valor, dentro_del_ganador or clave in ("winningPlan", "queryPlan"))
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            etapas += etapas_plan(valor, dentro_del_ganador)
+    return etapas
+
+def estadisticas_ejecucion(nodo):
+    if isinstance(nodo, dict):
+        if "executionStats" in nodo:
+            return nodo["executionStats"]
+        for valor in nodo.values():
+            encontradas = estadisticas_ejecucion(valor)
+            if encontradas:
+                return encontradas
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            encontradas = estadisticas_ejecucion(valor)
+            if encontradas:
+                return encontradas
+    return None
+
+def explicar(db, consulta, muestra):
+    coleccion = consulta["coleccion"]
+    if "pipeline" in consulta:
+        comando = {"aggregate": coleccion, "pipeline": consulta["pipeline"](muestra), "cursor": {}}
+        if "collation" in consulta:
+            comando["collation"] = consulta["collation"]
+    else:
+        comando = {"find": coleccion, "filter": consulta["filtro"](muestra)}
+        for opcion in ("projection", "sort", "limit", "collation"):
+            if opcion in consulta:
+                comando[opcion] = consulta[opcion]
+    return db.command("explain", comando, verbosity="executionStats")
+
+# Corre explain() para cada ruta y devuelve los hallazgos (COLLSCAN o planes poco selectivos)
+def verificar_planes(db, umbral=10):
+    hallazgos = []
+    for consulta in CONSULTAS:
+        muestra = db[consulta["coleccion"]].find_one()
+        if muestra is None:
+            print(f"⏭️ {consulta['ruta']}: {consulta['coleccion']} está vacía")
+            continue
+
+        plan = explicar(db, consulta, muestra)
+        etapas = etapas_plan(plan)
+        stats = estadisticas_ejecucion(plan) or {}
+        examinados = stats.get("totalDocsExamined", 0)
+        devueltos = stats.get("nReturned", 0)
+
+        problemas = []
+        if "COLLSCAN" in etapas:
+            problemas.append("COLLSCAN")
+        if "pipeline" not in consulta and examinados > umbral * max(devueltos, 1):
+            problemas.append(f"examina {examinados} documentos para devolver {devueltos}")
+        if consulta.get("cubierta") and examinados > 0:
+            problemas.append(f"debería ser cubierta y lee {examinados} documentos")
+
+        estado = "⚠️" if problemas else "✅"
+        print(f"{estado} {consulta['ruta']}: {' → '.join(reversed(etapas))} ({examinados} examinados, {devueltos} devueltos)")
+        if problemas:
+            hallazgos.append({"ruta": consulta["ruta"], "problemas": problemas, "etapas": etapas})
+    return hallazgos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincroniza y verifica los índices de la API")
+    parser.add_argument("comando", choices=["sincronizar", "verificar"])
+    parser.add_argument("--umbral", type=int, default=10, help="Documentos examinados por documento devuelto antes de marcar el plan")
+    args = parser.parse_args()
+
+    db = MongoClient(MONGO_URI)[DB_NAME]
+    if args.comando == "sincronizar":
+        sincronizar_indices(db)
+    else:
+        hallazgos = verificar_planes(db, args.umbral)
+        print(f"{len(hallazgos)} rutas con planes a revisar.")
+        sys.exit(1 if hallazgos else 0)
@@ -0,0 +1,171 @@
+# Tareas de mantenimiento sobre los datos ya cargados
+# Uso: python mantenimiento.py ubicaciones | calificaciones | ventas | estados
+
+import os
+import re
+import argparse
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+# Cargar variables de entorno
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME", "proyecto2-db")
+
+# Estados válidos de una orden, en su forma canónica
+ESTADOS_VALIDOS = ["Cancelado", "Entregado", "Pendiente", "Preparando"]
+ESTADOS_CANONICOS = {estado.casefold(): estado for estado in ESTADOS_VALIDOS}
+
+# Devuelve el estado canónico sin importar mayúsculas ni espacios ("  entregado" → "Entregado")
+def normalizar_estado(estado):
+    canonico = ESTADOS_CANONICOS.get(str(estado).strip().casefold())
+    if canonico is None:
+        raise ValueError(f"Estado inválido: {estado}")
+    return canonico
+
+# Reescribe en su forma canónica los estados de las órdenes que difieren solo en mayúsculas o espacios,
+# para que las consultas por igualdad usen idx_estado_total. Marca "actualizado" para los reportes
+# incrementales y reconstruye los acumulados de ventas, que se agrupan por estado.
+def normalizar_estados_ordenes(db):
+    ahora = datetime.utcnow()
+    modificadas = 0
+    for estado in ESTADOS_VALIDOS:
+        resultado = db.ordenes.update_many(
+            {"estado": {"$regex": f"^\\s*{re.escape(estado)}\\s*$", "$options": "i", "$ne": estado}},
+            {"$set": {"estado": estado, "actualizado": ahora}}
+        )
+        modificadas += resultado.modified_count
+    print(f"🏷️ {modificadas} órdenes con estado normalizado.")
+
+    desconocidas = db.ordenes.count_documents({"estado": {"$nin": ESTADOS_VALIDOS}})
+    if desconocidas:
+        print(f"⚠️ {desconocidas} órdenes tienen un estado que no es válido y no se modificaron.")
+    if modificadas:
+        reconstruir_ventas_diarias(db)
+
+# Agrega el punto GeoJSON (ubicacion_geo) a los restaurantes que solo tienen latitud y longitud sueltas,
+# ya sea en "ubicacion" (importados) o en "direccion.ubicacion" (creados desde la API)
+def completar_ubicaciones_geo(db):
+    longitud = {"$ifNull": ["$ubicacion.longitud", "$direccion.ubicacion.longitud"]}
+    latitud = {"$ifNull": ["$ubicacion.latitud", "$direccion.ubicacion.latitud"]}
+    resultado = db.restaurantes.update_many(
+        {
+            "ubicacion_geo": {"$exists": False},
+            "$or": [
+                {"ubicacion.longitud": {"$type": "number"}},
+                {"direccion.ubicacion.longitud": {"$type": "number"}}
+            ]
+        },
+        [{"$set": {"ubicacion_geo": {"type": "Point", "coordinates": [longitud, latitud]}}}]
+    )
+    print(f"📍 {resultado.modified_count} restaurantes con ubicación GeoJSON nueva.")
+
+# Promedio a partir de los contadores; null si el restaurante no tiene reseñas
+PROMEDIO_CALIFICACION = {
+    "$cond": [
+        {"$gt": ["$resenas_total", 0]},
+        {"$divide": ["$resenas_suma", "$resenas_total"]},
+        None
+    ]
+}
+
+# Reconstruye desde cero los contadores de reseñas de cada restaurante (suma, total y promedio)
+# y los escribe con $merge; corrige cualquier desviación de los contadores incrementales de la API
+def pipeline_reconciliar_calificaciones():
+    return [
+        {
+            "$lookup": {
+                "from": "resenas",
+                "let": {"restaurante_id": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$reviewed_id", "$$restaurante_id"]}, "type": "restaurante"}},
+                    {"$group": {"_id": None, "suma": {"$sum": "$calificacion"}, "total": {"$sum": 1}}}
+                ],
+                "as": "resenas"
+            }
+        },
+        {
+            "$project": {
+                "resenas_suma": {"$ifNull": [{"$first": "$resenas.suma"}, 0]},
+                "resenas_total": {"$ifNull": [{"$first": "$resenas.total"}, 0]}
+            }
+        },
+        {"$set": {"calificacion_promedio": PROMEDIO_CALIFICACION}},
+        {"$merge": {"into": "restaurantes", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]
+
+def reconciliar_calificaciones(db):
+    db.restaurantes.aggregate(pipeline_reconciliar_calificaciones())
+    print("⭐ Contadores de calificación de restaurantes reconstruidos.")
+
+# Reconstruye desde las órdenes los acumulados diarios de ventas (ventas_diarias): un documento por
+# restaurante, item del menú, día y estado con la cantidad, el bruto, el descuento y las órdenes.
+# $out reemplaza la colección al terminar y conserva sus índices.
+def pipeline_ventas_diarias():
+    return [
+        {"$unwind": "$items"},
+        # Primero por orden, para contar una sola vez la orden que repite un item
+        {
+            "$group": {
+                "_id": {
+                    "restaurante_id": "$restaurante_id",
+                    "item_id": "$items.item_id",
+                    "dia": {"$dateTrunc": {"date": "$fecha", "unit": "day"}},
+                    "estado": "$estado",
+                    "orden_id": "$_id"
+                },
+                "cantidad": {"$sum": "$items.cantidad"},
+                "bruto": {"$sum": {"$multiply": ["$items.cantidad", "$items.precio_unitario"]}},
+                "descuento": {"$sum": {"$multiply": ["$items.cantidad", "$items.precio_unitario", "$items.descuento"]}}
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "restaurante_id": "$_id.restaurante_id",
+                    "item_id": "$_id.item_id",
+                    "dia": "$_id.dia",
+                    "estado": "$_id.estado"
+                },
+                "cantidad": {"$sum": "$cantidad"},
+                "bruto": {"$sum": "$bruto"},
+                "descuento": {"$sum": "$descuento"},
+                "ordenes": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "restaurante_id": "$_id.restaurante_id",
+                "item_id": "$_id.item_id",
+                "dia": "$_id.dia",
+                "estado": "$_id.estado",
+                "cantidad": 1,
+                "bruto": 1,
+                "descuento": 1,
+                "ordenes": 1
+            }
+        },
+        {"$out": "ventas_diarias"}
+    ]
+
+def reconstruir_ventas_diarias(db):
+    db.ordenes.aggregate(pipeline_ventas_diarias(), allowDiskUse=True)
+    print(f"📅 {db.ventas_diarias.estimated_document_count()} acumulados diarios de ventas reconstruidos.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tareas de mantenimiento de la base de datos")
+    parser.add_argument("tarea", choices=["ubicaciones", "calificaciones", "ventas", "estados"])
+    args = parser.parse_args()
+
+    db = MongoClient(MONGO_URI)[DB_NAME]
+    if args.tarea == "ubicaciones":
+        completar_ubicaciones_geo(db)
+    elif args.tarea == "calificaciones":
+        reconciliar_calificaciones(db)
+    elif args.tarea == "ventas":
+        reconstruir_ventas_diarias(db)
+    elif args.tarea == "estados":
+        normalizar_estados_ordenes(db)
@@ -0,0 +1,235 @@
+# Métricas de la API en el formato de texto de Prometheus (expuestas en GET /metrics)
+# - Middleware ASGI: latencia, tamaño de respuesta y solicitudes en curso por ruta
+# - Listeners de pymongo: duración y documentos devueltos por colección y comando,
+#   espera por una conexión del pool y conexiones en uso
+# - Tiempo de serialización de las respuestas (RespuestaMongo)
+#
+# Las rutas se etiquetan con su plantilla ("/orden/{orden_id}") para no crear una serie por ID.
+# Los valores son por proceso: con varios workers de uvicorn, Prometheus debe consultar cada uno.
+
+import time
+import threading
+from bisect import bisect_left
+from pymongo import monitoring
+from starlette.routing import Match
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+BUCKETS_DOCUMENTOS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def formatear_etiquetas(nombres, valores, extra=""):
+    pares = [f'{nombre}="{escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.valores = {}
+        self.lock = threading.Lock()
+
+    def sumar(self, *valores_etiquetas, cantidad=1):
+        with self.lock:
+            self.valores[valores_etiquetas] = self.valores.get(valores_etiquetas, 0) + cantidad
+
+    def lineas(self):
+        with self.lock:
+            return [f"{self.nombre}{formatear_etiquetas(self.etiquetas, clave)} {valor}"
+                    for clave, valor in sorted(self.valores.items())]
+
+
+class Medidor(Contador):
+    tipo = "gauge"
+
+    def restar(self, *valores_etiquetas, cantidad=1):
+        self.sumar(*valores_etiquetas, cantidad=-cantidad)
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self.series = {}  # etiquetas → [conteos por bucket (+Inf al final), suma]
+        self.lock = threading.Lock()
+
+    def observar(self, valor, *valores_etiquetas):
+        with self.lock:
+            serie = self.series.get(valores_etiquetas)
+            if serie is None:
+                serie = self.series[valores_etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][bisect_left(self.buckets, valor)] += 1
+            serie[1] += valor
+
+    def lineas(self):
+        lineas = []
+        with self.lock:
+            for clave, (conteos, suma) in sorted(self.series.items()):
+                acumulado = 0
+                for limite, conteo in zip(self.buckets + ("+Inf",), conteos):
+                    acumulado += conteo
+                    etiquetas = formatear_etiquetas(self.etiquetas, clave, f'le="{limite}"')
+                    lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+                lineas.append(f"{self.nombre}_sum{formatear_etiquetas(self.etiquetas, clave)} {suma}")
+                lineas.append(f"{self.nombre}_count{formatear_etiquetas(self.etiquetas, clave)} {acumulado}")
+        return lineas
+
+
+# Métricas de la API
+http_duracion = Histograma("api_http_duracion_segundos", "Latencia de las solicitudes HTTP", ("metodo", "ruta", "estado"))
+http_bytes = Histograma("api_http_respuesta_bytes", "Tamaño del cuerpo de las respuestas", ("metodo", "ruta"), BUCKETS_BYTES)
+http_en_curso = Medidor("api_http_en_curso", "Solicitudes HTTP en curso", ("metodo", "ruta"))
+serializacion = Histograma("api_serializacion_segundos", "Tiempo de serialización de documentos a JSON")
+mongo_duracion = Histograma("api_mongo_comando_duracion_segundos", "Duración de los comandos de Mongo", ("coleccion", "comando"))
+mongo_documentos = Histograma("api_mongo_documentos_devueltos", "Documentos devueltos por lote de comando", ("coleccion", "comando"), BUCKETS_DOCUMENTOS)
+mongo_fallos = Contador("api_mongo_comando_fallos_total", "Comandos de Mongo que fallaron", ("coleccion", "comando"))
+pool_espera = Histograma("api_mongo_pool_espera_segundos", "Espera para obtener una conexión del pool")
+pool_fallos = Contador("api_mongo_pool_fallos_total", "Intentos fallidos de obtener una conexión del pool", ("motivo",))
+pool_en_uso = Medidor("api_mongo_pool_conexiones_en_uso", "Conexiones del pool prestadas en este momento", ("servidor",))
+
+REGISTRO = [http_duracion, http_bytes, http_en_curso, serializacion,
+            mongo_duracion, mongo_documentos, mongo_fallos, pool_espera, pool_fallos, pool_en_uso]
+
+
+# Texto de todas las métricas en el formato de exposición de Prometheus
+def exponer():
+    lineas = []
+    for metrica in REGISTRO:
+        lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+        lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+        lineas += metrica.lineas()
+    return "\n".join(lineas) + "\n"
+
+
+SIN_RUTA = "sin_ruta"
+
+# Plantilla de la ruta que va a atender la solicitud, resuelta antes de llamar a la aplicación
+# para poder contar las solicitudes en curso por ruta (el router solo la deja en el scope al final)
+def resolver_ruta(router, scope):
+    parcial = None
+    for ruta in router.routes:
+        coincidencia, _ = ruta.matches(scope)
+        if coincidencia == Match.FULL:
+            return ruta.path
+        if coincidencia == Match.PARTIAL and parcial is None:
+            parcial = ruta.path
+    return parcial or SIN_RUTA
+
+# Middleware ASGI: mide cada solicitud HTTP hasta que se envía el último fragmento del cuerpo
+class MiddlewareMetricas:
+    def __init__(self, app, router=None):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metodo = scope["method"]
+        inicio = time.perf_counter()
+        respuesta = {"estado": 500, "bytes": 0}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["estado"] = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                respuesta["bytes"] += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        ruta = resolver_ruta(self.router, scope) if self.router is not None else SIN_RUTA
+        http_en_curso.sumar(metodo, ruta)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            http_en_curso.restar(metodo, ruta)
+            # Sin router, se usa la ruta que el router de Starlette dejó en el scope al atenderla
+            if self.router is None:
+                ruta = getattr(scope.get("route"), "path", SIN_RUTA)
+            http_duracion.observar(time.perf_counter() - inicio, metodo, ruta, respuesta["estado"])
+            http_bytes.observar(respuesta["bytes"], metodo, ruta)
+
+
+# Nombre de la colección de un comando; getMore la trae en "collection"
+def coleccion_de(evento):
+    if evento.command_name == "getMore":
+        return evento.command.get("collection", "")
+    valor = evento.command.get(evento.command_name)
+    return valor if isinstance(valor, str) else ""
+
+def documentos_de(respuesta):
+    cursor = respuesta.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "values" in respuesta:  # distinct
+        return len(respuesta["values"])
+    return respuesta.get("n", 0)
+
+
+class ComandosMongo(monitoring.CommandListener):
+    COMANDOS_INTERNOS = {"hello", "isMaster", "ping", "endSessions", "saslStart", "saslContinue", "killCursors"}
+
+    def __init__(self):
+        self.pendientes = {}  # (conexión, request_id) → colección
+        self.lock = threading.Lock()
+
+    def started(self, evento):
+        if evento.command_name in self.COMANDOS_INTERNOS:
+            return
+        with self.lock:
+            self.pendientes[(evento.connection_id, evento.request_id)] = coleccion_de(evento)
+
+    def terminar(self, evento):
+        with self.lock:
+            return self.pendientes.pop((evento.connection_id, evento.request_id), None)
+
+    def succeeded(self, evento):
+        coleccion = self.terminar(evento)
+        if coleccion is None:
+            return
+        mongo_duracion.observar(evento.duration_micros / 1e6, coleccion, evento.command_name)
+        mongo_documentos.observar(documentos_de(evento.reply), coleccion, evento.command_name)
+
+    def failed(self, evento):
+        coleccion = self.terminar(evento)
+        if coleccion is None:
+            return
+        mongo_duracion.observar(evento.duration_micros / 1e6, coleccion, evento.command_name)
+        mongo_fallos.sumar(coleccion, evento.command_name)
+
+
+class PoolMongo(monitoring.ConnectionPoolListener):
+    def connection_checked_out(self, evento):
+        if evento.duration is not None:
+            pool_espera.observar(evento.duration)
+        pool_en_uso.sumar(f"{evento.address[0]}:{evento.address[1]}")
+
+    def connection_checked_in(self, evento):
+        pool_en_uso.restar(f"{evento.address[0]}:{evento.address[1]}")
+
+    def connection_check_out_failed(self, evento):
+        if evento.duration is not None:
+            pool_espera.observar(evento.duration)
+        pool_fallos.sumar(evento.reason)
+
+    # El resto de los eventos del pool no se miden
+    def pool_created(self, evento): pass
+    def pool_ready(self, evento): pass
+    def pool_cleared(self, evento): pass
+    def pool_closed(self, evento): pass
+    def connection_created(self, evento): pass
+    def connection_ready(self, evento): pass
+    def connection_closed(self, evento): pass
+    def connection_check_out_started(self, evento): pass
@@ -1,211 +1,284 @@
 import os
+import sys
 import csv
-import subprocess
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 from bson import ObjectId
 from datetime import datetime
-from pymongo import MongoClient, TEXT, ASCENDING, DESCENDING, GEOSPHERE
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from indices import sincronizar_indices
+from mantenimiento import normalizar_estado, reconciliar_calificaciones, reconstruir_ventas_diarias
 
 # Cargar variables de entorno
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = "proyecto2-db"
-
-# Archivos de entrada y colecciones
-colecciones = [
-    ("usuarios.csv", "usuarios"),
-    ("restaurantes.csv", "restaurantes"),
-    ("menu_items.csv", "menu_items"),
-    ("ordenes.csv", "ordenes"),
-    ("resenas.csv", "resenas"),
-]
-
-# Mapas para temp_ids → ObjectIds
-id_map = {}
-
-def generar_csv_con_ids_verdaderos():
-    # === 1. USUARIOS ===
-    with open("Data/usuarios.csv", newline="", encoding="utf-8") as fin, \
-         open("Data/tmp_usuarios.csv", "w", newline="", encoding="utf-8") as fout:
-        reader = csv.DictReader(fin)
-        writer = csv.DictWriter(fout, fieldnames=[
-            "_id", "nombre", "correo", "telefono",
-            "direccion_nombre", "longitud", "latitud", "municipio",
-            "fecha_registro"
-        ])
-        writer.writeheader()
-        for row in reader:
-            obj_id = str(ObjectId())
-            id_map[row["temp_id"]] = obj_id
-            writer.writerow({
-                "_id": obj_id,
-                "nombre": row["nombre"],
-                "correo": row["correo"],
-                "telefono": row["telefono"],
-                "direccion_nombre": row["direccion_nombre"],
-                "longitud": row["longitud"],
-                "latitud": row["latitud"],
-                "municipio": row["municipio"],
-                "fecha_registro": row["fecha_registro"],
-            })
-
-    # === 2. RESTAURANTES ===
-    with open("Data/restaurantes.csv", newline="", encoding="utf-8") as fin, \
-         open("Data/tmp_restaurantes.csv", "w", newline="", encoding="utf-8") as fout:
-        reader = csv.DictReader(fin)
-        writer = csv.DictWriter(fout, fieldnames=[
-            "_id", "nombre", "longitud", "latitud", "departamento",
-            "ciudad", "categoria", "calificacion_promedio", "horario"
-        ])
-        writer.writeheader()
-        for row in reader:
-            obj_id = str(ObjectId())
-            id_map[row["temp_id"]] = obj_id
-            writer.writerow({
-                "_id": obj_id,
-                "nombre": row["nombre"],
-                "longitud": row["longitud"],
-                "latitud": row["latitud"],
-                "departamento": row["departamento"],
-                "ciudad": row["ciudad"],
-                "categoria": row["categoria"],
-                "calificacion_promedio": row["calificacion_promedio"],
-                "horario": row["horario"],
-            })
-
-    # === 3. MENÚ ===
-    with open("Data/menu_items.csv", newline="", encoding="utf-8") as fin, \
-         open("Data/tmp_menu_items.csv", "w", newline="", encoding="utf-8") as fout:
-        reader = csv.DictReader(fin)
-        writer = csv.DictWriter(fout, fieldnames=[
-            "_id", "nombre", "descripcion", "ingredientes", "precio",
-            "disponible", "categoria", "restaurante_id"
-        ])
-        writer.writeheader()
-        for row in reader:
-            obj_id = str(ObjectId())
-            id_map[row["temp_id"]] = obj_id
-            writer.writerow({
-                "_id": obj_id,
-                "nombre": row["nombre"],
-                "descripcion": row["descripcion"],
-                "ingredientes": row["ingredientes"],
-                "precio": row["precio"],
-                "disponible": row["disponible"],
-                "categoria": row["categoria"],
-                "restaurante_id": id_map[row["restaurante_id"]],
-            })
-
-    # === 4. ORDENES ===
-    with open("Data/ordenes.csv", newline="", encoding="utf-8") as fin, \
-         open("Data/tmp_ordenes.csv", "w", newline="", encoding="utf-8") as fout:
-        reader = csv.DictReader(fin)
-        writer = csv.DictWriter(fout, fieldnames=[
-            "_id", "usuario_id", "restaurante_id", "fecha", "estado",
-            "items", "total"
-        ])
-        writer.writeheader()
-        for row in reader:
-            obj_id = str(ObjectId())
-            id_map[row["temp_id"]] = obj_id
-            items_final = []
-            for item in row["items"].split("|"):
-                item_id, cantidad, precio, descuento = item.split(":")
-                items_final.append({
-                    "item_id": id_map[item_id],
-                    "cantidad": int(cantidad),
-                    "precio_unitario": float(precio),
-                    "descuento": float(descuento)
-                })
-            writer.writerow({
-                "_id": obj_id,
-                "usuario_id": id_map[row["usuario_id"]],
-                "restaurante_id": id_map[row["restaurante_id"]],
-                "fecha": row["fecha"],
-                "estado": row["estado"],
-                "items": items_final,
-                "total": row["total"],
-            })
-
-    # === 5. RESEÑAS ===
-    with open("Data/resenas.csv", newline="", encoding="utf-8") as fin, \
-        open("Data/tmp_resenas.csv", "w", newline="", encoding="utf-8") as fout:
-        reader = csv.DictReader(fin)
-        writer = csv.DictWriter(fout, fieldnames=[
-            "_id", "reviewed_id", "type", "usuario_id", "comentario", "calificacion", "fecha"
-        ])
-        writer.writeheader()
-        for row in reader:
-            obj_id = str(ObjectId())
-            id_map[row["temp_id"]] = obj_id
-            writer.writerow({
-                "_id": obj_id,
-                "reviewed_id": id_map[row["reviewed_id"]],
-                "type": row["type"],
-                "usuario_id": id_map.get(row["usuario_id"]),
-                "comentario": row["comentario"],
-                "calificacion": row["calificacion"],
-                "fecha": row["fecha"],
-            })
-
-def ejecutar_importaciones():
-    colecciones_tmp = [
-        ("Data/tmp_usuarios.csv", "usuarios"),
-        ("Data/tmp_restaurantes.csv", "restaurantes"),
-        ("Data/tmp_menu_items.csv", "menu_items"),
-        ("Data/tmp_ordenes.csv", "ordenes"),
-        ("Data/tmp_resenas.csv", "resenas")
+DB_NAME = os.getenv("DB_NAME", "proyecto2-db")
+LOTE_IMPORTACION = int(os.getenv("LOTE_IMPORTACION", 5000))
+DIR_CHECKPOINTS = os.path.join("Data", "checkpoints")
+
+# temp_id → ObjectId determinista: el ID se deriva del hash del temp_id, así cualquier proceso
+# calcula la misma referencia sin compartir un mapa y una importación repetida genera los mismos IDs
+def id_determinista(temp_id):
+    if not temp_id:
+        return None
+    return ObjectId(hashlib.blake2b(temp_id.encode("utf-8"), digest_size=12).digest())
+
+# Constructores de documentos tipados a partir de cada fila del CSV
+def construir_usuario(row):
+    return {
+        "_id": id_determinista(row["temp_id"]),
+        "nombre": row["nombre"],
+        "correo": row["correo"],
+        "telefono": row["telefono"],
+        "direccion": {
+            "nombre": row["direccion_nombre"],
+            "municipio": row["municipio"],
+            "ubicacion": {
+                "latitud": float(row["latitud"]),
+                "longitud": float(row["longitud"]),
+            },
+        },
+        "fecha_registro": datetime.fromisoformat(row["fecha_registro"]),
+    }
+
+def construir_restaurante(row):
+    return {
+        "_id": id_determinista(row["temp_id"]),
+        "nombre": row["nombre"],
+        "ubicacion": {
+            "latitud": float(row["latitud"]),
+            "longitud": float(row["longitud"]),
+        },
+        "ubicacion_geo": {"type": "Point", "coordinates": [float(row["longitud"]), float(row["latitud"])]},
+        "departamento": row["departamento"],
+        "ciudad": row["ciudad"],
+        "categoria": row["categoria"],
+        "horario": row["horario"],
+    }
+
+def construir_menu_item(row):
+    return {
+        "_id": id_determinista(row["temp_id"]),
+        "nombre": row["nombre"],
+        "descripcion": row["descripcion"],
+        "ingredientes": [i.strip() for i in row["ingredientes"].split(",") if i.strip()],
+        "precio": float(row["precio"]),
+        "disponible": int(row["disponible"]),
+        "categoria": row["categoria"],
+        "restaurante_id": id_determinista(row["restaurante_id"]),
+    }
+
+def construir_orden(row):
+    items = []
+    for item in row["items"].split("|"):
+        item_id, cantidad, precio, descuento = item.split(":")
+        items.append({
+            "item_id": id_determinista(item_id),
+            "cantidad": int(cantidad),
+            "precio_unitario": float(precio),
+            "descuento": float(descuento)
+        })
+    return {
+        "_id": id_determinista(row["temp_id"]),
+        "usuario_id": id_determinista(row["usuario_id"]),
+        "restaurante_id": id_determinista(row["restaurante_id"]),
+        "fecha": datetime.fromisoformat(row["fecha"]),
+        "estado": normalizar_estado(row["estado"]),
+        "items": items,
+        "total": float(row["total"]),
+    }
+
+def construir_resena(row):
+    return {
+        "_id": id_determinista(row["temp_id"]),
+        "reviewed_id": id_determinista(row["reviewed_id"]),
+        "type": row["type"],
+        "usuario_id": id_determinista(row["usuario_id"]),
+        "comentario": row["comentario"],
+        "calificacion": int(row["calificacion"]),
+        "fecha": datetime.fromisoformat(row["fecha"]),
+    }
+
+# Archivos de entrada, colecciones y constructores; con IDs deterministas ninguna colección
+# depende de otra, así que todas (y los shards de cada una) se cargan en paralelo
+colecciones = {
+    "usuarios": ("usuarios.csv", construir_usuario),
+    "restaurantes": ("restaurantes.csv", construir_restaurante),
+    "menu_items": ("menu_items.csv", construir_menu_item),
+    "ordenes": ("ordenes.csv", construir_orden),
+    "resenas": ("resenas.csv", construir_resena),
+}
+
+# Error de una importación que no se puede continuar; el mensaje dice qué hacer
+class ImportacionInvalida(Exception):
+    pass
+
+# Checkpoint por colección y shard: filas ya confirmadas en Mongo. Guarda también el número de
+# shards y el tamaño del CSV, porque las filas contadas solo valen para el mismo rango de bytes
+def ruta_checkpoint(coleccion, shard, shards):
+    return os.path.join(DIR_CHECKPOINTS, f"{coleccion}_{shard}de{shards}.json")
+
+def leer_checkpoint(coleccion, shard, shards, tamaño):
+    otros = [
+        archivo for archivo in os.listdir(DIR_CHECKPOINTS)
+        if archivo.startswith(f"{coleccion}_") and archivo.endswith(".json") and not archivo.endswith(f"de{shards}.json")
     ]
-    for archivo, coleccion in colecciones_tmp:
-        comando = [
-            "mongoimport",
-            f"--uri={MONGO_URI}",
-            "--collection", coleccion,
-            "--type", "csv",
-            "--file", archivo,
-            "--headerline"
-        ]
-        print(f"📥 Importando {archivo} a {coleccion}...")
-        subprocess.run(comando, check=True)
-        print(f"✅ {coleccion} importada.")
+    if otros:
+        raise ImportacionInvalida(
+            f"Hay checkpoints de {coleccion} con otro número de shards ({', '.join(sorted(otros))}); "
+            f"reanuda con el mismo --shards o usa --reiniciar"
+        )
+    ruta = ruta_checkpoint(coleccion, shard, shards)
+    if not os.path.exists(ruta):
+        return {"filas": 0, "completo": False}
+    with open(ruta, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("shards") != shards or checkpoint.get("tamaño") != tamaño:
+        raise ImportacionInvalida(
+            f"El checkpoint {ruta} es de otro CSV u otro número de shards; usa --reiniciar"
+        )
+    return checkpoint
 
-def crear_indices():
-    print("🔧 Creando índices...")
+def guardar_checkpoint(coleccion, shard, shards, tamaño, filas, completo=False):
+    ruta = ruta_checkpoint(coleccion, shard, shards)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"filas": filas, "completo": completo, "shards": shards, "tamaño": tamaño}, f)
+    os.replace(ruta + ".tmp", ruta)
 
-    client = MongoClient(MONGO_URI)
-    db = client["test"]
+# Inserta un lote desordenado. Solo al reanudar se toleran los duplicados: el primer lote después
+# de un checkpoint puede repetir documentos que ya se habían insertado
+def insertar_lote(db, coleccion, lote, tolerar_duplicados=False):
+    try:
+        db[coleccion].insert_many(lote, ordered=False)
+    except BulkWriteError as e:
+        errores = [err for err in e.details["writeErrors"] if not (tolerar_duplicados and err["code"] == 11000)]
+        if any(err["code"] == 11000 for err in errores):
+            raise ImportacionInvalida(
+                f"La colección {coleccion} ya tiene datos; usa --reiniciar para reemplazarlos "
+                f"o reanuda la importación anterior con sus checkpoints"
+            ) from None
+        if errores:
+            raise
 
-    # 1. Usuarios
-    db.usuarios.create_index("correo", name="idx_correo")  # Simple
-    db.usuarios.create_index([("nombre", ASCENDING), ("fecha_registro", DESCENDING)], name="idx_nombre_fecha")  # Compuesto
+# Rangos de bytes [inicio, fin) de cada shard, cortados en inicios de línea (las filas que escribe
+# dataFaker.py no tienen saltos de línea dentro de los campos)
+def rangos_shards(ruta, shards):
+    tamaño = os.path.getsize(ruta)
+    with open(ruta, "rb") as f:
+        encabezado = len(f.readline())
+        cortes = [encabezado]
+        for k in range(1, shards):
+            # Leer desde un byte antes completa la línea en curso y deja el cursor al inicio de la siguiente
+            f.seek(max(encabezado, tamaño * k // shards) - 1)
+            f.readline()
+            cortes.append(max(f.tell(), cortes[-1]))
+        cortes.append(tamaño)
+    return list(zip(cortes, cortes[1:]))
 
-    # 2. Restaurantes
-    db.restaurantes.create_index([("longitud", 1), ("latitud", 1)], name="idx_geo_pos")  # Geoespacial 2dsphere
-    db.restaurantes.create_index("categoria", name="idx_categoria")  # Simple
-    db.restaurantes.create_index([("nombre", TEXT), ("ciudad", TEXT)], name="idx_texto_nombre_ciudad")  # Texto
+def leer_encabezado(ruta):
+    with open(ruta, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f))
 
-    # 3. Menú
-    db.menu_items.create_index("disponible", name="idx_disponible")  # Simple
-    db.menu_items.create_index([("restaurante_id", ASCENDING), ("categoria", ASCENDING)], name="idx_rest_categoria")  # Compuesto
-    db.menu_items.create_index([("descripcion", TEXT)], name="idx_texto_descripcion")  # Texto
+def lineas_rango(f, inicio, fin):
+    f.seek(inicio)
+    posicion = inicio
+    for linea in f:
+        if posicion >= fin:
+            break
+        posicion += len(linea)
+        yield linea.decode("utf-8")
 
-    # 4. Ordenes
-    db.ordenes.create_index([("usuario_id", ASCENDING), ("fecha", DESCENDING)], name="idx_usuario_fecha")  # Compuesto
-    db.ordenes.create_index("estado", name="idx_estado")  # Simple
-    db.ordenes.create_index("items.item_id", name="idx_items_multikey")  # Multikey
+# Cada shard lee solo su rango de bytes del CSV e inserta sus filas en lotes grandes y desordenados
+def importar_shard(coleccion, shard, shards):
+    archivo, construir = colecciones[coleccion]
+    ruta = os.path.join("Data", archivo)
+    tamaño = os.path.getsize(ruta)
+    checkpoint = leer_checkpoint(coleccion, shard, shards, tamaño)
+    if checkpoint["completo"]:
+        print(f"⏭️ {coleccion} (shard {shard + 1}/{shards}) ya estaba importada.")
+        return checkpoint["filas"]
 
-    # 5. Reseñas
-    db.resenas.create_index("usuario_id", name="idx_usuario")  # Simple
-    db.resenas.create_index("reviewed_id", name="idx_restaurante")  # Simple
-    db.resenas.create_index([("calificacion", DESCENDING), ("fecha", DESCENDING)], name="idx_calif_fecha")  # Compuesto
+    print(f"📥 Importando {archivo} a {coleccion} (shard {shard + 1}/{shards}, desde la fila {checkpoint['filas']})...")
+    inicio, fin = rangos_shards(ruta, shards)[shard]
+    reanudando = checkpoint["filas"] > 0
+    filas = 0
+    lote = []
+    with MongoClient(MONGO_URI) as client, open(ruta, "rb") as f:
+        db = client[DB_NAME]
+        for row in csv.DictReader(lineas_rango(f, inicio, fin), fieldnames=leer_encabezado(ruta)):
+            filas += 1
+            if filas <= checkpoint["filas"]:
+                continue
+            lote.append(construir(row))
+            if len(lote) >= LOTE_IMPORTACION:
+                insertar_lote(db, coleccion, lote, tolerar_duplicados=reanudando)
+                guardar_checkpoint(coleccion, shard, shards, tamaño, filas)
+                reanudando = False
+                lote = []
+        if lote:
+            insertar_lote(db, coleccion, lote, tolerar_duplicados=reanudando)
+    guardar_checkpoint(coleccion, shard, shards, tamaño, filas, completo=True)
+    print(f"✅ {coleccion} (shard {shard + 1}/{shards}) importada ({filas} documentos).")
+    return filas
 
-    print("✅ Índices creados.")
+def ejecutar_importaciones(procesos=None, shards=1, reiniciar=False):
+    os.makedirs(DIR_CHECKPOINTS, exist_ok=True)
+    if reiniciar:
+        for archivo in os.listdir(DIR_CHECKPOINTS):
+            os.remove(os.path.join(DIR_CHECKPOINTS, archivo))
+        # Empezar de cero también vacía las colecciones: con IDs deterministas los datos viejos
+        # chocarían con los nuevos
+        with MongoClient(MONGO_URI) as client:
+            for coleccion in colecciones:
+                client[DB_NAME].drop_collection(coleccion)
 
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        futuros = [
+            executor.submit(importar_shard, coleccion, shard, shards)
+            for coleccion in colecciones
+            for shard in range(shards)
+        ]
+        for futuro in futuros:
+            futuro.result()
 
-if __name__ == "__main__":
-    generar_csv_con_ids_verdaderos()
-    ejecutar_importaciones()
+# Índices de la API sobre la misma base que se importó (ver indices.py)
+def crear_indices():
+    with MongoClient(MONGO_URI) as client:
+        sincronizar_indices(client[DB_NAME])
+
+# Borra las marcas de agua para que la API reconstruya los reportes completos con los datos nuevos
+def reiniciar_reportes():
+    with MongoClient(MONGO_URI) as client:
+        client[DB_NAME].reportes_estado.delete_many({})
+    print("🔄 Reportes marcados para reconstrucción.")
+
+# Deja la base lista para la API después de cargar los datos (también lo usa dataFaker.py --formato mongo)
+def finalizar_importacion():
     crear_indices()
+    with MongoClient(MONGO_URI) as client:
+        db = client[DB_NAME]
+        reconciliar_calificaciones(db)
+        reconstruir_ventas_diarias(db)
+    reiniciar_reportes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa los CSV de Data/ a MongoDB")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument("--shards", type=int, default=1, help="Shards en los que se divide cada colección")
+    parser.add_argument("--reiniciar", action="store_true", help="Borra los checkpoints y las colecciones y empieza de cero")
+    args = parser.parse_args()
+
+    try:
+        ejecutar_importaciones(args.procesos, args.shards, args.reiniciar)
+    except ImportacionInvalida as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finalizar_importacion()
 
 
     
\ No newline at end of file